@@ -1,26 +1,67 @@
-from flask import Flask, request
-import requests, json, os, re
+from flask import Flask, Response, request, jsonify
+import base64, hashlib, hmac, json, os, re
 from dotenv import load_dotenv
-from shopify_utils import fetch_order_status_by_phone
-from gemini_handler import smart_gemini_reply
+from shopify_utils import fetch_order_status_by_phone, order_index, shopify_client
+from gemini_handler import GEMINI_KEYWORDS, ask_gemini, gemini_stats, predefined_response, response_cache
+from keyword_matcher import ReloadingMatcher
+from session_store import create_session_store
+from job_queue import JobQueue
+from dedup import SeenIds
+from whatsapp_sender import WhatsAppSender
+from metrics import metrics
+from structured_log import configure_logging
+from concurrent.futures import ThreadPoolExecutor
+import logging
 
 load_dotenv()
+configure_logging()
+log = logging.getLogger("app")
 
 app = Flask(__name__)
 
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
 VERIFY_TOKEN = os.getenv("VERIFY_TOKEN")
-WHATSAPP_API_URL = f"https://graph.facebook.com/v19.0/{PHONE_NUMBER_ID}/messages"
+SHOPIFY_WEBHOOK_SECRET = os.getenv("SHOPIFY_WEBHOOK_SECRET")
+GRAPH_API_BASE = os.getenv("GRAPH_API_BASE", "https://graph.facebook.com/v19.0")
+
+# Outbound sends: messages/second per phone number (Meta throughput tier),
+# connection pool size and retries on 429/5xx. The limiter is per process,
+# so each gunicorn worker gets WHATSAPP_MPS / WEB_CONCURRENCY (gunicorn also
+# reads WEB_CONCURRENCY as its worker count; keep it in step with -w).
+WHATSAPP_MPS = float(os.getenv("WHATSAPP_MPS", 80))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+WHATSAPP_POOL_SIZE = int(os.getenv("WHATSAPP_POOL_SIZE", 20))
+WHATSAPP_MAX_RETRIES = int(os.getenv("WHATSAPP_MAX_RETRIES", 3))
+WHATSAPP_TIMEOUT = float(os.getenv("WHATSAPP_TIMEOUT", 10))
+# Seconds a send may spend retrying. In sync mode this plus one attempt's
+# timeout has to fit inside gunicorn's worker timeout (30 s by default)
+WHATSAPP_RETRY_BUDGET = float(os.getenv("WHATSAPP_RETRY_BUDGET", 10))
+
+# "sync" handles messages inside the request, "async" acks right away and
+# hands them to a background worker pool
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "sync").lower()
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 500))
+WEBHOOK_QUEUE_WAIT = float(os.getenv("WEBHOOK_QUEUE_WAIT", 0))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 20))
+
+# Meta redelivers webhooks it thinks failed; remember message ids for a while
+DEDUP_MAX_IDS = int(os.getenv("DEDUP_MAX_IDS", 50000))
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", 24 * 3600))
 
 FAQ_FILE = "faq.json"
-faq = {}
-if os.path.exists(FAQ_FILE):
-    with open(FAQ_FILE, "r") as f:
-        faq = json.load(f)
+FAQ_RELOAD_INTERVAL = float(os.getenv("FAQ_RELOAD_INTERVAL", 2))
 
-# Store session-like state in memory (basic for now)
-user_sessions = {}
+# Quiz state per user. "dict" keeps it in this worker only, "lru" bounds it,
+# "sqlite" shares it between all gunicorn workers on the host.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "dict")
+SESSION_MAX = int(os.getenv("SESSION_MAX", 10000))
+SESSION_TTL = float(os.getenv("SESSION_TTL", 3600))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+user_sessions = create_session_store(SESSION_BACKEND, maxsize=SESSION_MAX, ttl=SESSION_TTL,
+                                     path=SESSION_DB_PATH)
 
 ABUSIVE_KEYWORDS = set([
     "fuck", "bitch", "bastard", "mc", "bc", "madarchod", "behenchod", "chutiya",
@@ -34,6 +75,16 @@ ABUSIVE_KEYWORDS = set([
     "bosdike", "aand", "suar ki aulad", "tatti", "bakchod", "chodu", "gaand mara", "maal", "hot girl"
 ])
 
+# ABUSIVE_KEYWORDS only match whole words. These stems also match with any
+# ending ("fucking", "bitches", "bhosdike"); only add stems that never start
+# an ordinary word, since "maal" would also catch "maalish"
+ABUSIVE_PREFIXES = {"fuck", "motherfuck", "bitch", "madarchod", "behenchod", "bhosdi", "chutiya"}
+
+# One matcher for abuse, FAQ and Gemini topic keywords, rebuilt when faq.json changes
+keyword_matcher = ReloadingMatcher(FAQ_FILE, ABUSIVE_KEYWORDS, GEMINI_KEYWORDS,
+                                   check_interval=FAQ_RELOAD_INTERVAL,
+                                   abusive_prefixes=ABUSIVE_PREFIXES)
+
 @app.route("/webhook", methods=["GET"])
 def verify():
     mode = request.args.get("hub.mode")
@@ -45,74 +96,217 @@ def verify():
 
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    data = request.get_json()
+    with metrics.stage("webhook"):
+        status = _webhook()
+    metrics.inc("webhook_requests_total", status=status[1])
+    return status
+
+def _webhook():
+    data = request.get_json(silent=True)
+    messages, statuses = collect_events(data)
+
+    # Delivery receipts and non-text messages are cheap, deal with them inline
+    for status in statuses:
+        handle_status(status)
+
+    batches = {}
+    for message in messages:
+        if 'text' not in message:
+            log.info("non-text message", extra={"type": message.get('type')})
+            metrics.inc("messages_total", route="non_text")
+            continue
+        message_id = message.get('id')
+        if message_id and not seen_message_ids.add(message_id):
+            log.info("duplicate delivery ignored", extra={"message_id": message_id})
+            metrics.inc("messages_total", route="duplicate")
+            continue
+        batches.setdefault(message.get('from'), []).append(message)
+
+    if not batches:
+        return "OK", 200
+
+    # One job per sender, different senders handled concurrently. In async
+    # mode jobs are sharded by sender, so one user's messages run in order
+    # across deliveries too (within this worker process).
+    if WEBHOOK_MODE == "async":
+        rejected = False
+        for user_id, batch in batches.items():
+            # Full queue: let Meta redeliver later instead of piling up work
+            if not job_queue.submit(batch, timeout=WEBHOOK_QUEUE_WAIT, key=user_id):
+                for message in batch:
+                    seen_message_ids.discard(message.get('id'))
+                rejected = True
+        return ("Busy", 503) if rejected else ("OK", 200)
+
+    if len(batches) == 1:
+        handle_messages(next(iter(batches.values())))
+    else:
+        list(batch_executor.map(handle_messages, batches.values()))
+    return "OK", 200
+
+def collect_events(data):
+    messages, statuses = [], []
+    if not isinstance(data, dict):
+        return messages, statuses
+    # Skip anything malformed: erroring here would make Meta redeliver forever
+    for entry in _dicts(data.get('entry')):
+        for change in _dicts(entry.get('changes')):
+            value = change.get('value')
+            if not isinstance(value, dict):
+                continue
+            messages.extend(_dicts(value.get('messages')))
+            statuses.extend(_dicts(value.get('statuses')))
+    return messages, statuses
+
+def _dicts(items):
+    if not isinstance(items, list):
+        return []
+    return [item for item in items if isinstance(item, dict)]
+
+def handle_status(status):
+    metrics.inc("statuses_total", status=status.get('status'))
+    log.debug("message status", extra={"status": status.get('status'), "message_id": status.get('id')})
+
+@app.route("/shopify/webhook", methods=["POST"])
+def shopify_webhook():
+    # Index updates decide what customers are told, so only signed calls count
+    body = request.get_data()
+    if not SHOPIFY_WEBHOOK_SECRET or not verify_shopify_hmac(body, request.headers.get("X-Shopify-Hmac-Sha256")):
+        return "Unauthorized", 401
+    if order_index is None:
+        return "OK", 200
+
+    topic = request.headers.get("X-Shopify-Topic", "")
+    try:
+        payload = json.loads(body)
+        if not isinstance(payload, dict):
+            raise TypeError("payload is not a JSON object")
+        if not order_index.apply_webhook(topic, payload):
+            log.warning("ignoring shopify webhook", extra={"topic": topic})
+    except (ValueError, KeyError, TypeError) as e:
+        log.warning("bad shopify webhook", extra={"topic": topic, "error": str(e)})
+        return "Bad Request", 400
+    return "OK", 200
+
+def verify_shopify_hmac(body, signature):
+    if not signature:
+        return False
+    digest = hmac.new(SHOPIFY_WEBHOOK_SECRET.encode(), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(component_stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+def component_stats():
+    return {
+        "webhook_mode": WEBHOOK_MODE,
+        "queue": job_queue.stats(),
+        "dedup": seen_message_ids.stats(),
+        "keywords": keyword_matcher.stats(),
+        "sessions": user_sessions.stats(),
+        "whatsapp": whatsapp_sender.stats(),
+        "gemini_cache": response_cache.stats(),
+        "gemini": gemini_stats(),
+        "shopify": shopify_client.stats(),
+        "order_index": order_index.stats() if order_index else None,
+    }
+
+def handle_messages(batch):
+    for message in batch:
+        handle_message(message)
+
+def handle_message(message):
+    route = "error"
+    try:
+        with metrics.stage("handle"):
+            route = route_message(message)
+    finally:
+        metrics.inc("messages_total", route=route)
+
+def route_message(message):
     try:
-        message = data['entry'][0]['changes'][0]['value']['messages'][0]
         user_id = message['from']
 
         if 'text' not in message:
-            print("⚠️ Non-text message received")
-            return "OK", 200
+            log.info("non-text message", extra={"type": message.get('type')})
+            return "non_text"
 
         user_text = message['text']['body'].strip().lower()
-        print(f"📩 Incoming: {user_text}")
+        log.info("incoming message", extra={"message_id": message.get('id'), "chars": len(user_text)})
+        log.debug("incoming text", extra={"message_id": message.get('id'), "text": user_text})
 
         # Abusive content check
-        if any(abuse in user_text for abuse in ABUSIVE_KEYWORDS):
+        with metrics.stage("abuse"):
+            abusive = keyword_matcher.match(user_text, categories=("abuse",)) is not None
+        if abusive:
             reply = "⚠️ Let's keep things respectful. If you're feeling stressed, Ashwagandha is great for calming the mind. 🌿"
             send_whatsapp_message(user_id, reply)
-            return "OK", 200
+            return "abuse"
 
         # Phone number check
-        phone = extract_phone_number(user_text)
+        with metrics.stage("phone"):
+            phone = extract_phone_number(user_text)
         if phone:
-            reply = fetch_order_status_by_phone(phone)
+            with metrics.stage("shopify"):
+                reply = fetch_order_status_by_phone(phone)
             send_whatsapp_message(user_id, reply)
-            return "OK", 200
+            return "order"
 
-        # FAQ match
-        reply = check_faq(user_text)
-        if reply:
-            send_whatsapp_message(user_id, reply)
-            return "OK", 200
+        # FAQ match; the same pass finds the Gemini topic used further down
+        with metrics.stage("faq"):
+            rule = keyword_matcher.match(user_text, categories=("faq", "gemini"))
+        if rule and rule.category == "faq" and rule.response:
+            send_whatsapp_message(user_id, rule.response)
+            return "faq"
 
         # Session Quiz
-        if user_id not in user_sessions:
-            user_sessions[user_id] = {"stage": None}
-
-        session = user_sessions[user_id]
-
-        if user_text in ["start quiz", "start", "quiz", "1"]:
-            session["stage"] = "quiz_started"
-            reply = ("Let's begin your Ayurvedic Discovery Quiz! 🌿\n\n"
-                     "What's your primary concern?\n"
-                     "1. Skin Issues\n"
-                     "2. Hair Fall\n"
-                     "3. Digestion\n"
-                     "4. Immunity\n(Reply with the number)")
-            send_whatsapp_message(user_id, reply)
-            return "OK", 200
-
-        if session.get("stage") == "quiz_started":
-            if user_text in ["1", "2", "3", "4"]:
-                result = {
-                    "1": "🌿 *Skin Care Tip*: Try our Kumkumadi Face Wash for bright, glowing skin!",
-                    "2": "🧠 *Hair Fall Tip*: Our Dashmool Hair Oil strengthens roots and reduces breakage.",
-                    "3": "🔥 *Digestion Boost*: Triphala Juice supports gentle detox and digestive balance.",
-                    "4": "💪 *Immunity Support*: Amla Juice & Ashwagandha Tablets are great daily picks."
-                }
-                send_whatsapp_message(user_id, result[user_text])
-                session["stage"] = None
-                return "OK", 200
-
-        # Gemini fallback
-        gemini_reply = smart_gemini_reply(user_text)
+        with metrics.stage("quiz"):
+            quiz_reply = quiz_step(user_id, user_text)
+        if quiz_reply:
+            send_whatsapp_message(user_id, quiz_reply)
+            return "quiz"
+
+        # Topic keywords, then Gemini fallback
+        if rule and rule.category == "gemini":
+            gemini_reply = predefined_response(rule.key)
+            route = "topic"
+        else:
+            with metrics.stage("gemini"):
+                gemini_reply = ask_gemini(user_text)
+            route = "gemini"
         send_whatsapp_message(user_id, gemini_reply)
+        return route
 
-    except Exception as e:
-        print("❌ Webhook error:", e)
+    except Exception:
+        log.exception("webhook error", extra={"message_id": message.get('id')})
+        return "error"
 
-    return "OK", 200
+def quiz_step(user_id, user_text):
+    """Advance the discovery quiz for this message. Returns the reply, or None if it isn't a quiz message."""
+    if user_text in ["start quiz", "start", "quiz", "1"]:
+        user_sessions.set_stage(user_id, "quiz_started")
+        return ("Let's begin your Ayurvedic Discovery Quiz! 🌿\n\n"
+                "What's your primary concern?\n"
+                "1. Skin Issues\n"
+                "2. Hair Fall\n"
+                "3. Digestion\n"
+                "4. Immunity\n(Reply with the number)")
+
+    if user_text in ["1", "2", "3", "4"] and user_sessions.get_stage(user_id) == "quiz_started":
+        result = {
+            "1": "🌿 *Skin Care Tip*: Try our Kumkumadi Face Wash for bright, glowing skin!",
+            "2": "🧠 *Hair Fall Tip*: Our Dashmool Hair Oil strengthens roots and reduces breakage.",
+            "3": "🔥 *Digestion Boost*: Triphala Juice supports gentle detox and digestive balance.",
+            "4": "💪 *Immunity Support*: Amla Juice & Ashwagandha Tablets are great daily picks."
+        }
+        user_sessions.set_stage(user_id, None)
+        return result[user_text]
+    return None
 
 def extract_phone_number(msg):
     match = re.search(r"\b\d{10}\b", msg)
@@ -120,26 +314,24 @@ def extract_phone_number(msg):
         return "+91" + match.group()
     return None
 
-def check_faq(msg):
-    for key, entry in faq.items():
-        if isinstance(entry, dict) and "keywords" in entry:
-            for keyword in entry["keywords"]:
-                if keyword.lower() in msg:
-                    return entry.get("response")
-    return None
-
 def send_whatsapp_message(to, message):
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": to,
-        "text": {"body": message}
-    }
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    r = requests.post(WHATSAPP_API_URL, headers=headers, json=payload)
-    print("✅ Sent:", r.status_code)
+    with metrics.stage("send"):
+        return whatsapp_sender.send_text(to, message)
+
+def broadcast_whatsapp_message(recipients, message):
+    return whatsapp_sender.send_bulk((to, message) for to in recipients)
+
+whatsapp_sender = WhatsAppSender(ACCESS_TOKEN, PHONE_NUMBER_ID, api_base=GRAPH_API_BASE,
+                                 rate=WHATSAPP_MPS / WEB_CONCURRENCY, pool_size=WHATSAPP_POOL_SIZE,
+                                 timeout=(3.05, WHATSAPP_TIMEOUT), max_retries=WHATSAPP_MAX_RETRIES,
+                                 retry_budget=WHATSAPP_RETRY_BUDGET)
+seen_message_ids = SeenIds(maxsize=DEDUP_MAX_IDS, ttl=DEDUP_TTL)
+batch_executor = ThreadPoolExecutor(max_workers=WEBHOOK_WORKERS, thread_name_prefix="webhook-batch")
+job_queue = JobQueue(handle_messages, workers=WEBHOOK_WORKERS, maxsize=WEBHOOK_QUEUE_SIZE,
+                     drain_timeout=WEBHOOK_DRAIN_TIMEOUT, name="webhook")
+
+# Numeric fields of /stats are exported as gauges on /metrics too
+metrics.register_collector("component", component_stats)
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
@@ -0,0 +1,89 @@
+"""Per-message cost of keyword routing as the keyword lists grow.
+
+Compares the old substring scans (abuse list, FAQ loops, Gemini topic loop)
+with the single KeywordMatcher pass.
+
+    python bench/bench_matcher.py [--sizes 100,1000,5000,20000] [--messages 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+
+SAMPLE_MESSAGES = [
+    "hi there, is this the right number",
+    "where is my order, it has been a week",
+    "do you have any offers on kumkumadi face wash",
+    "which oil is best for hair fall and dandruff",
+    "i feel stressed and can't sleep properly at night",
+    "please share the refund policy for damaged items",
+    "what is the difference between vata pitta and kapha dosha",
+    "can I get ashwagandha tablets delivered to bangalore by friday",
+]
+
+
+def random_word(rng, lo=4, hi=10):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(lo, hi)))
+
+
+def build_lists(size, rng):
+    abusive = {random_word(rng) for _ in range(size // 3)}
+    faq = {}
+    for i in range(max(1, size // 30)):
+        faq[f"faq{i}"] = {"keywords": [random_word(rng) for _ in range(10)], "response": f"answer {i}"}
+    topics = {f"topic{i}": [random_word(rng) for _ in range(10)] for i in range(max(1, size // 30))}
+    return abusive, faq, topics
+
+
+def naive_route(text, abusive, faq, topics):
+    if any(abuse in text for abuse in abusive):
+        return "abuse"
+    for key, entry in faq.items():
+        for keyword in entry["keywords"]:
+            if keyword in text:
+                return key
+    for topic, keywords in topics.items():
+        if any(keyword in text for keyword in keywords):
+            return topic
+    return None
+
+
+def per_message_us(fn, messages):
+    start = time.perf_counter()
+    for text in messages:
+        fn(text)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,5000,20000")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [rng.choice(SAMPLE_MESSAGES) for _ in range(args.messages)]
+
+    print(f"{'keywords':>9} {'naive us/msg':>13} {'matcher us/msg':>15} {'build ms':>9} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        abusive, faq, topics = build_lists(size, rng)
+        total = len(abusive) + sum(len(e["keywords"]) for e in faq.values()) + sum(map(len, topics.values()))
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(abusive, faq, topics)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        naive = per_message_us(lambda t: naive_route(t, abusive, faq, topics), messages)
+        fast = per_message_us(matcher.match, messages)
+        print(f"{total:>9} {naive:>13.1f} {fast:>15.1f} {build_ms:>9.1f} {naive / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
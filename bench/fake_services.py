@@ -0,0 +1,199 @@
+"""Local stand-ins for the WhatsApp Graph API, Shopify Admin GraphQL and Gemini.
+
+Each service answers with the response shape the app expects, after a
+configurable latency, and fails a configurable fraction of requests.
+
+    python bench/fake_services.py --gemini-latency-ms 800 --gemini-error-rate 0.05
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATUSES = ["FULFILLED", "UNFULFILLED", "PARTIALLY_FULFILLED", "IN_PROGRESS"]
+
+
+@dataclass
+class ServiceConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    port: int = 0
+
+
+class FakeService:
+    def __init__(self, name, config, respond):
+        self.name = name
+        self.config = config
+        self.respond = respond
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", config.port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"fake-{name}", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                service.handle(self, body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def handle(self, request, body):
+        config = self.config
+        delay = random.gauss(config.latency_ms, config.jitter_ms) if config.jitter_ms else config.latency_ms
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        failed = random.random() < config.error_rate
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+        if failed:
+            status, payload, headers = config.error_status, {"error": {"message": f"fake {self.name} failure"}}, {}
+            if status == 429:
+                headers["Retry-After"] = "1"
+        else:
+            status, headers = 200, {}
+            try:
+                payload = self.respond(request.path, json.loads(body or b"{}"))
+            except ValueError:
+                status, payload = 400, {"error": {"message": "bad json"}}
+
+        data = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors}
+
+
+_ids = itertools.count(1)
+
+
+def graph_response(path, body):
+    return {
+        "messaging_product": "whatsapp",
+        "contacts": [{"input": body.get("to"), "wa_id": body.get("to")}],
+        "messages": [{"id": f"wamid.fake{next(_ids)}"}],
+    }
+
+
+def shopify_response(path, body):
+    phone = (body.get("variables") or {}).get("query", "")
+    rng = random.Random(phone)
+    # About one number in ten has no customer record
+    if rng.random() < 0.1:
+        nodes = []
+    else:
+        nodes = [{
+            "firstName": "Bench",
+            "orders": {"nodes": [{
+                "name": f"#{rng.randint(1000, 99999)}",
+                "displayFulfillmentStatus": rng.choice(STATUSES),
+            }]},
+        }]
+    return {
+        "data": {"customers": {"nodes": nodes}},
+        "extensions": {"cost": {
+            "requestedQueryCost": 4,
+            "actualQueryCost": 4,
+            "throttleStatus": {"maximumAvailable": 2000.0, "currentlyAvailable": 1996, "restoreRate": 100.0},
+        }},
+    }
+
+
+def gemini_response(path, body):
+    parts = ((body.get("contents") or [{}])[0].get("parts") or [{}])
+    question = parts[0].get("text", "")
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": f"Fake Ayurveda answer to: {question[:80]}"}]},
+            "finishReason": "STOP",
+        }],
+    }
+
+
+def start_fake_services(graph=None, shopify=None, gemini=None):
+    """Start all three stand-ins on free ports; returns {name: FakeService}."""
+    return {
+        "graph": FakeService("graph", graph or ServiceConfig(), graph_response).start(),
+        "shopify": FakeService("shopify", shopify or ServiceConfig(), shopify_response).start(),
+        "gemini": FakeService("gemini", gemini or ServiceConfig(), gemini_response).start(),
+    }
+
+
+def add_service_args(parser, name, latency_ms, error_status=500):
+    parser.add_argument(f"--{name}-latency-ms", type=float, default=latency_ms)
+    parser.add_argument(f"--{name}-jitter-ms", type=float, default=latency_ms / 4)
+    parser.add_argument(f"--{name}-error-rate", type=float, default=0.0)
+    parser.add_argument(f"--{name}-error-status", type=int, default=error_status)
+    parser.add_argument(f"--{name}-port", type=int, default=0)
+
+
+def service_config(args, name):
+    key = name.replace("-", "_")
+    return ServiceConfig(
+        latency_ms=getattr(args, f"{key}_latency_ms"),
+        jitter_ms=getattr(args, f"{key}_jitter_ms"),
+        error_rate=getattr(args, f"{key}_error_rate"),
+        error_status=getattr(args, f"{key}_error_status"),
+        port=getattr(args, f"{key}_port"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_service_args(parser, "graph", 40)
+    add_service_args(parser, "shopify", 150)
+    add_service_args(parser, "gemini", 800)
+    args = parser.parse_args()
+
+    services = start_fake_services(*(service_config(args, n) for n in ("graph", "shopify", "gemini")))
+    print(f"GRAPH_API_BASE={services['graph'].url}/v19.0")
+    print(f"SHOPIFY_API_URL={services['shopify'].url}/admin/api/2024-04/graphql.json")
+    print(f"GEMINI_API_URL={services['gemini'].url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for service in services.values():
+            service.stop()
+
+
+if __name__ == "__main__":
+    main()
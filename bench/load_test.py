@@ -0,0 +1,281 @@
+"""Offline load test: replay a webhook corpus against the app under gunicorn.
+
+Starts the fake Graph API, Shopify and Gemini services, launches gunicorn
+pointed at them, replays a recorded (JSONL, one webhook body per line) or
+synthetic corpus, then reports throughput, client latency and per-stage
+p50/p95/p99 taken from the app's /metrics histograms.
+
+    python bench/load_test.py --requests 2000 --concurrency 32 --mode async
+    python bench/load_test.py --corpus webhooks.jsonl --gemini-latency-ms 1500
+
+Stage histograms are per gunicorn worker, so the stage table is exact
+only with --workers 1 (the default; scale with --threads instead).
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_services import add_service_args, service_config, start_fake_services  # noqa: E402
+from metrics import parse_histograms, quantile  # noqa: E402
+
+STAGES = ["webhook", "handle", "abuse", "phone", "faq", "quiz", "gemini", "shopify", "send"]
+
+TEXTS = {
+    "faq": ["hi", "hello there", "namaste", "I want to buy something", "track my order please",
+            "any discount coupon?", "refund policy", "I have a complaint"],
+    "order": ["my number is {phone}", "{phone}", "order status for {phone} please"],
+    "abuse": ["you are a bastard", "fuck off", "bakchod bot"],
+    "quiz": ["start quiz", "1", "2", "3", "4"],
+    "topic": ["tell me about kumkumadi", "which serum is good", "any combo deal", "what is my dosha"],
+    "gemini": ["what should I eat for better energy in the morning",
+               "is it safe to take herbs during pregnancy",
+               "how long before I see results on my skin",
+               "can kids use your products",
+               "do you ship to dubai",
+               "what are the ingredients in your face pack"],
+}
+WEIGHTS = {"faq": 30, "order": 15, "abuse": 5, "quiz": 10, "topic": 15, "gemini": 20, "status": 5}
+
+
+def webhook_body(messages=(), statuses=()):
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{"id": "bench", "changes": [{"field": "messages", "value": {
+            "messaging_product": "whatsapp",
+            "metadata": {"phone_number_id": "1000"},
+            "messages": list(messages),
+            "statuses": list(statuses),
+        }}]}],
+    }
+
+
+def synthetic_corpus(count, users=500, duplicate_rate=0.05, seed=1):
+    rng = random.Random(seed)
+    kinds, weights = zip(*WEIGHTS.items())
+    corpus = []
+    for i in range(count):
+        if corpus and rng.random() < duplicate_rate:
+            corpus.append(rng.choice(corpus))
+            continue
+        kind = rng.choices(kinds, weights)[0]
+        user = f"91{9000000000 + rng.randrange(users)}"
+        if kind == "status":
+            corpus.append(webhook_body(statuses=[{"id": f"wamid.out{i}", "status": "delivered",
+                                                  "recipient_id": user}]))
+            continue
+        text = rng.choice(TEXTS[kind]).format(phone=rng.randint(6000000000, 9999999999))
+        corpus.append(webhook_body(messages=[{
+            "from": user, "id": f"wamid.bench{i}", "timestamp": str(int(time.time())),
+            "type": "text", "text": {"body": text},
+        }]))
+    return corpus
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if requests.get(f"{base_url}/stats", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready")
+
+
+def wait_drained(base_url, timeout=120):
+    """In async mode, wait until the worker pool has emptied its queue."""
+    deadline = time.monotonic() + timeout
+    idle = 0
+    while time.monotonic() < deadline and idle < 3:
+        queue = requests.get(f"{base_url}/stats", timeout=5).json()["queue"]
+        idle = idle + 1 if queue["depth"] == 0 and queue["busy"] == 0 else 0
+        time.sleep(0.2)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def stage_report(before, after):
+    old = parse_histograms(before, "chatbot_stage_seconds")
+    new = parse_histograms(after, "chatbot_stage_seconds")
+    report = {}
+    for key, buckets in new.items():
+        stage = dict(key).get("stage")
+        previous = dict(old.get(key, []))
+        delta = [(le, count - previous.get(le, 0)) for le, count in buckets]
+        if not delta or delta[-1][1] == 0:
+            continue
+        report[stage] = {
+            "count": int(delta[-1][1]),
+            **{f"p{int(q * 100)}_ms": round(quantile(delta, q) * 1000, 2) for q in (0.5, 0.95, 0.99)},
+        }
+    return report
+
+
+def counter_values(text, name):
+    values = {}
+    for line in text.splitlines():
+        if line.startswith(name + "{"):
+            labels, value = line[len(name) + 1:].rsplit("} ", 1)
+            values[labels.split("=", 1)[-1].strip('"')] = float(value)
+    return values
+
+
+def replay(base_url, corpus, concurrency):
+    local = threading.local()
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def post(body):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            status = session.post(f"{base_url}/webhook", json=body, timeout=30).status_code
+        except requests.RequestException:
+            status = "error"
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(post, corpus))
+    return time.perf_counter() - start, sorted(latencies), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="JSONL file of webhook bodies; synthetic if omitted")
+    parser.add_argument("--save-corpus", help="write the corpus used to this JSONL file")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app, may be repeated")
+    parser.add_argument("--json", help="also write the report as JSON to this path")
+    add_service_args(parser, "graph", 40)
+    add_service_args(parser, "shopify", 150)
+    add_service_args(parser, "gemini", 800)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(
+        args.requests, args.users, args.duplicate_rate)
+    if args.save_corpus:
+        with open(args.save_corpus, "w") as f:
+            f.writelines(json.dumps(body) + "\n" for body in corpus)
+
+    services = start_fake_services(*(service_config(args, n) for n in ("graph", "shopify", "gemini")))
+    workdir = tempfile.mkdtemp(prefix="chatbot-bench-")
+    port = free_port()
+    env = dict(
+        os.environ,
+        ACCESS_TOKEN="bench", PHONE_NUMBER_ID="1000", VERIFY_TOKEN="bench",
+        GRAPH_API_BASE=f"{services['graph'].url}/v19.0",
+        SHOPIFY_API_URL=f"{services['shopify'].url}/admin/api/2024-04/graphql.json",
+        SHOPIFY_ACCESS_TOKEN="bench",
+        GEMINI_API_URL=services["gemini"].url, GEMINI_API_KEY="bench",
+        ORDER_INDEX_PATH=os.path.join(workdir, "orders.db"),
+        SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+        GEMINI_CACHE_PATH="",
+        WEBHOOK_MODE=args.mode, WEB_CONCURRENCY=str(args.workers),
+        LOG_LEVEL=args.log_level,
+    )
+    env.update(item.split("=", 1) for item in args.app_env)
+
+    command = [sys.executable, "-m", "gunicorn", "app:app", "-b", f"127.0.0.1:{port}",
+               "-w", str(args.workers), "-k", "gthread", "--threads", str(args.threads),
+               "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url, process)
+        before = requests.get(f"{base_url}/metrics", timeout=5).text
+        elapsed, latencies, statuses = replay(base_url, corpus, args.concurrency)
+        drain_start = time.perf_counter()
+        if args.mode == "async":
+            wait_drained(base_url)
+        drained = time.perf_counter() - drain_start
+        after = requests.get(f"{base_url}/metrics", timeout=5).text
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        for service in services.values():
+            service.stop()
+
+    routes_before = counter_values(before, "chatbot_messages_total")
+    routes = {k: int(v - routes_before.get(k, 0)) for k, v in counter_values(after, "chatbot_messages_total").items()}
+    report = {
+        "requests": len(corpus),
+        "mode": args.mode,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(corpus) / elapsed, 1),
+        "client_ms": {f"p{int(q * 100)}": round(percentile(latencies, q) * 1000, 2) for q in (0.5, 0.95, 0.99)},
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "routes": routes,
+        "stages": stage_report(before, after),
+        "fakes": {name: service.stats() for name, service in services.items()},
+    }
+    if args.mode == "async":
+        # Acks return before the work is done; count the drain for real throughput
+        report["drain_s"] = round(drained, 3)
+        report["processed_rps"] = round(len(corpus) / (elapsed + drained), 1)
+
+    print(f"\n{report['requests']} webhooks in {report['elapsed_s']}s "
+          f"({report['throughput_rps']} req/s, {args.mode}, {args.workers}w x {args.threads}t)")
+    print("client latency ms:", report["client_ms"], " statuses:", report["statuses"])
+    print("routes:", report["routes"])
+    print(f"\n{'stage':<10} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage in STAGES:
+        row = report["stages"].get(stage)
+        if row:
+            print(f"{stage:<10} {row['count']:>7} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
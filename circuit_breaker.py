@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stops calling a dependency for ``cooldown`` seconds after repeated failures.
+
+    ``failure_threshold`` consecutive failures (errors, timeouts, or calls
+    slower than ``slow_call``) open the breaker. After the cooldown one probe
+    call is let through; its outcome closes the breaker or opens it again.
+    A probe that never reports back is replaced after another cooldown.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, slow_call=None, name="breaker"):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.slow_call = slow_call
+        self.name = name
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = None
+
+        self.opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+
+    def allow(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probe_at = None
+            if self.state == HALF_OPEN and (self._probe_at is None or now - self._probe_at >= self.cooldown):
+                self._probe_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, elapsed, ok=True):
+        slow = ok and self.slow_call is not None and elapsed > self.slow_call
+        with self._lock:
+            if ok and not slow:
+                self.successes += 1
+                self._failures = 0
+                self.state = CLOSED
+                return
+            if slow:
+                self.slow_calls += 1
+            else:
+                self.failures += 1
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                    log.warning("circuit opened", extra={"breaker": self.name, "bad_calls": self._failures})
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "successes": self.successes,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+            }
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SeenIds:
+    """Bounded set of recently seen ids that forgets entries after ``ttl`` seconds.
+
+    Every id gets the same TTL, so insertion order is also expiry order and
+    both the lookup and the eviction of expired/overflowing ids are O(1).
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _evict(self, now):
+        while self._ids:
+            oldest, expires_at = next(iter(self._ids.items()))
+            if expires_at > now:
+                break
+            del self._ids[oldest]
+            self.expired += 1
+        while len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+            self.evicted += 1
+
+    def add(self, item_id):
+        """Record ``item_id``. Returns False if it was already seen and still live."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            if item_id in self._ids:
+                self.duplicates += 1
+                return False
+            self._ids[item_id] = now + self.ttl
+            if len(self._ids) > self.maxsize:
+                self._ids.popitem(last=False)
+                self.evicted += 1
+            return True
+
+    def discard(self, item_id):
+        with self._lock:
+            self._ids.pop(item_id, None)
+
+    def __contains__(self, item_id):
+        with self._lock:
+            self._evict(time.monotonic())
+            return item_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._ids),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "duplicates": self.duplicates,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,248 @@
+import atexit
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+# Common Hinglish / chat spellings folded to one form before caching
+SPELLINGS = {
+    "u": "you", "ur": "your", "r": "are", "pls": "please", "plz": "please", "plss": "please",
+    "thx": "thanks", "thnx": "thanks", "thanku": "thanks", "ty": "thanks",
+    "hain": "hai",
+    "nhi": "nahi", "nahin": "nahi", "nai": "nahi",
+    "kese": "kaise", "kaisey": "kaise", "kaisa": "kaise", "kaisi": "kaise",
+    "kya": "kya", "kyaa": "kya", "kia": "kya",
+    "muje": "mujhe", "mjhe": "mujhe", "mujhko": "mujhe",
+    "chaiye": "chahiye", "chahie": "chahiye", "chahiyee": "chahiye",
+    "acha": "accha", "achha": "accha", "acchha": "accha",
+    "thik": "theek", "thk": "theek", "theekh": "theek",
+    "bta": "batao", "btao": "batao", "batado": "batao", "bata": "batao",
+    "kb": "kab", "kaha": "kahan", "kha": "kahan",
+    "pimple": "pimples", "hairfall": "hair fall",
+}
+
+# Words that flip a question's meaning. "t" is what's left of "don't",
+# "isn't" and "can't" after splitting on the apostrophe.
+NEGATIONS = {"no", "not", "never", "without", "nahi", "na", "mat", "bina", "dont", "cant", "t"}
+
+_WORD_RE = re.compile(r"\w+")
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
+
+# MinHash / LSH parameters: NUM_PERM = BANDS * ROWS
+NUM_PERM = 32
+BANDS = 8
+ROWS = 4
+_PRIME = (1 << 61) - 1
+# Fixed seed so signatures stay comparable across restarts and workers
+_rng = random.Random(0x7AC5)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize(text):
+    text = _REPEAT_RE.sub(r"\1\1", text.lower())
+    words = [SPELLINGS.get(w, w) for w in _WORD_RE.findall(text)]
+    return " ".join(words)
+
+
+def guard_tokens(normalized):
+    """Numbers and negations, which must agree exactly for a near-duplicate hit."""
+    return frozenset(w for w in normalized.split() if w in NEGATIONS or any(c.isdigit() for c in w))
+
+
+def shingles(normalized, k=3):
+    padded = f" {normalized} "
+    if len(padded) <= k:
+        return {padded}
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+
+def minhash(normalized):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(normalized)]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+class CacheEntry:
+    __slots__ = ("response", "expires_at", "signature", "latency")
+
+    def __init__(self, response, expires_at, signature, latency):
+        self.response = response
+        self.expires_at = expires_at
+        self.signature = signature
+        self.latency = latency
+
+
+class ResponseCache:
+    """LRU + TTL cache for Gemini replies with MinHash near-duplicate lookup.
+
+    Messages are normalized first, so exact hits already ignore case,
+    punctuation, spacing and common spelling variants. On an exact miss,
+    LSH bands of the message's MinHash signature find candidate entries and
+    the best one is served if its estimated Jaccard similarity reaches
+    ``threshold`` and both messages have the same numbers and negations
+    ("5 year old" is not "50 year old", "safe" is not "not safe").
+
+    Messages that normalize to nothing (emoji or punctuation only) are never
+    cached or looked up. With ``path`` set, entries are saved to a JSON file
+    every ``save_every`` writes and on exit, and reloaded on startup.
+    """
+
+    def __init__(self, maxsize=2000, ttl=24 * 3600, threshold=0.9, path=None, save_every=50):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.path = path
+        self.save_every = save_every
+        self._entries = OrderedDict()
+        self._bands = {}
+        self._lock = threading.Lock()
+        self._dirty = 0
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self.expired = 0
+        self.latency_saved = 0.0
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def _band_keys(self, signature):
+        return [(i, signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for band in self._band_keys(entry.signature):
+            keys = self._bands.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._bands[band]
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key)
+            self.expired += 1
+            return None
+        return entry
+
+    def get(self, text):
+        key = normalize(text)
+        now = time.time()
+        with self._lock:
+            if not key:
+                self.uncacheable += 1
+                return None
+            entry = self._live(key, now)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                self.latency_saved += entry.latency
+                return entry.response
+
+            if self.threshold < 1:
+                signature = minhash(key)
+                guard = guard_tokens(key)
+                candidates = set()
+                for band in self._band_keys(signature):
+                    candidates.update(self._bands.get(band, ()))
+                best_key, best_score = None, self.threshold
+                for candidate in candidates:
+                    other = self._live(candidate, now)
+                    if other is None or guard_tokens(candidate) != guard:
+                        continue
+                    score = similarity(signature, other.signature)
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    entry = self._entries[best_key]
+                    self._entries.move_to_end(best_key)
+                    self.near_hits += 1
+                    self.latency_saved += entry.latency
+                    return entry.response
+
+            self.misses += 1
+            return None
+
+    def put(self, text, response, latency=0.0):
+        key = normalize(text)
+        if not key:
+            return
+        entry = CacheEntry(response, time.time() + self.ttl, minhash(key), latency)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for band in self._band_keys(entry.signature):
+                self._bands.setdefault(band, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._dirty += 1
+            save = self.path and self._dirty >= self.save_every
+        if save:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for key, response, expires_at, latency in rows:
+                if expires_at <= now or not key:
+                    continue
+                entry = CacheEntry(response, expires_at, minhash(key), latency)
+                self._entries[key] = entry
+                for band in self._band_keys(entry.signature):
+                    self._bands.setdefault(band, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            rows = [[k, e.response, e.expires_at, e.latency] for k, e in self._entries.items()]
+            self._dirty = 0
+        # Write to a temp file and rename so a crash never leaves a torn cache
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(rows, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("could not save gemini cache", extra={"error": str(e)})
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "uncacheable": self.uncacheable,
+                "hit_rate": round((self.exact_hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+                "latency_saved_s": round(self.latency_saved, 3),
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
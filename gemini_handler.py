@@ -1,11 +1,57 @@
+import logging
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
 from google import genai
 from google.genai.types import Content 
+from keyword_matcher import tokenize
+from gemini_cache import ResponseCache
+from circuit_breaker import CircuitBreaker
 
 
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+log = logging.getLogger(__name__)
 
-model = genai.GenerativeModel("gemini-pro")
+GEMINI_MODEL = "gemini-pro"
+# Talk to a REST generateContent endpoint at this base URL instead of using
+# the SDK, e.g. the local stand-in from bench/fake_services.py
+GEMINI_API_URL = os.environ.get("GEMINI_API_URL")
+
+if GEMINI_API_URL:
+    model = None
+    gemini_http = requests.Session()
+else:
+    genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+    model = genai.GenerativeModel(GEMINI_MODEL)
+
+# Customers ask the same questions in slightly different words; cache replies.
+# GEMINI_CACHE_SIMILARITY=1 turns off near-duplicate matching.
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get("GEMINI_CACHE_SIZE", 2000)),
+    ttl=float(os.environ.get("GEMINI_CACHE_TTL", 24 * 3600)),
+    threshold=float(os.environ.get("GEMINI_CACHE_SIMILARITY", 0.9)),
+    path=os.environ.get("GEMINI_CACHE_PATH") or None,
+)
+
+# Latency budget: calls past GEMINI_TIMEOUT get a predefined reply instead.
+# GEMINI_HEDGE_AFTER > 0 fires a second, racing call when the first is slow.
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 5))
+GEMINI_SLOW_CALL = float(os.environ.get("GEMINI_SLOW_CALL", 3))
+GEMINI_HEDGE_AFTER = float(os.environ.get("GEMINI_HEDGE_AFTER", 0))
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", 8))
+
+gemini_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get("GEMINI_BREAKER_FAILURES", 5)),
+    cooldown=float(os.environ.get("GEMINI_BREAKER_COOLDOWN", 30)),
+    slow_call=GEMINI_SLOW_CALL,
+    name="gemini",
+)
+# Timed-out calls keep running in the background; the semaphore caps how many
+gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+gemini_counts = {"calls": 0, "hedged": 0, "timeout": 0, "error": 0, "breaker_open": 0, "busy": 0}
+_counts_lock = threading.Lock()
 
 GEMINI_KEYWORDS = {
     "products": ["kumkumadi", "shilajit", "face wash", "oil", "serum", "kit", "turmeric", "amla", "ashwagandha", "saffron", "hair oil"],
@@ -14,17 +60,120 @@ GEMINI_KEYWORDS = {
     "quiz": ["start quiz", "discovery quiz", "dosha", "quiz"]
 }
 
-def smart_gemini_reply(user_message):
-    user_msg = user_message.lower()
+def ask_gemini(user_message):
+    cached = response_cache.get(user_message)
+    if cached is not None:
+        return cached
+
+    if not gemini_breaker.allow():
+        return fallback_reply(user_message, "breaker_open")
+
+    start = time.monotonic()
+    first = _submit(user_message)
+    if first is None:
+        # Every slot is held by a call still running (Gemini is not keeping
+        # up), or the executor is shutting down
+        gemini_breaker.record(0, ok=False)
+        return fallback_reply(user_message, "busy")
+
+    deadline = start + GEMINI_TIMEOUT
+    hedge_at = start + GEMINI_HEDGE_AFTER if 0 < GEMINI_HEDGE_AFTER < GEMINI_TIMEOUT else None
+    pending = {first}
+    error = None
+    while pending:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        wake = deadline if hedge_at is None else min(deadline, hedge_at)
+        done, pending = wait(pending, timeout=wake - now, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                elapsed = time.monotonic() - start
+                reply = future.result()
+                gemini_breaker.record(elapsed)
+                response_cache.put(user_message, reply, latency=elapsed)
+                return reply
+            error = future.exception()
+
+        if hedge_at is not None and time.monotonic() >= hedge_at:
+            hedge_at = None
+            hedge = _submit(user_message)
+            if hedge is not None:
+                pending.add(hedge)
+                _count("hedged")
+
+    gemini_breaker.record(time.monotonic() - start, ok=False)
+    if pending:
+        return fallback_reply(user_message, "timeout")
+    log.error("gemini call failed", extra={"error": str(error)})
+    return fallback_reply(user_message, "error")
+
+def _submit(user_message):
+    if not gemini_slots.acquire(blocking=False):
+        return None
+    try:
+        future = gemini_executor.submit(_call_gemini, user_message)
+    except RuntimeError:
+        # Executor is shutting down; _call_gemini will never release the slot
+        gemini_slots.release()
+        return None
+    _count("calls")
+    return future
+
+def _call_gemini(user_message):
+    try:
+        if model is None:
+            return _call_gemini_rest(user_message)
+        # Bound the call itself too, so a hung request gives its slot back
+        response = model.generate_content([Content(parts=[user_message])],
+                                          request_options={"timeout": GEMINI_TIMEOUT})
+        return response.text.strip()
+    finally:
+        gemini_slots.release()
+
+def _call_gemini_rest(user_message):
+    response = gemini_http.post(
+        f"{GEMINI_API_URL.rstrip('/')}/v1beta/models/{GEMINI_MODEL}:generateContent",
+        params={"key": os.environ.get("GEMINI_API_KEY", "")},
+        json={"contents": [{"parts": [{"text": user_message}]}]},
+        timeout=GEMINI_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+
+def _count(name):
+    with _counts_lock:
+        gemini_counts[name] += 1
+
+def fallback_reply(user_message, reason):
+    _count(reason)
+    return predefined_response(guess_topic(user_message))
 
-    # Fast keyword reply
+def guess_topic(user_message):
+    # Loose match for fallbacks: "stressed" or "oils" should still land on a
+    # topic even though the exact keyword pass skipped them
+    words = [w for w in tokenize(user_message) if len(w) >= 4]
+    best, best_score = None, 0
     for topic, keywords in GEMINI_KEYWORDS.items():
-        if any(keyword in user_msg for keyword in keywords):
-            return predefined_response(topic)
+        score = 0
+        for keyword in keywords:
+            for part in tokenize(keyword):
+                if any(w.startswith(part) or part.startswith(w) for w in words):
+                    score += 1
+        if score > best_score:
+            best, best_score = topic, score
+    return best
 
-    # Fallback to Gemini AI
-    response = model.generate_content([Content(parts=[user_message])])
-    return response.text.strip()
+def gemini_stats():
+    with _counts_lock:
+        counts = dict(gemini_counts)
+    return {
+        "breaker": gemini_breaker.stats(),
+        "counts": counts,
+        "fallbacks": sum(counts[k] for k in ("timeout", "error", "breaker_open", "busy")),
+        "timeout_s": GEMINI_TIMEOUT,
+        "hedge_after_s": GEMINI_HEDGE_AFTER,
+    }
 
 def predefined_response(topic):
     if topic == "products":
@@ -0,0 +1,150 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class JobQueue:
+    """Bounded in-process job queue drained by a fixed pool of worker threads.
+
+    Each worker owns one queue shard. Jobs submitted with the same ``key``
+    always land on the same shard, so they run one at a time and in order.
+    """
+
+    def __init__(self, handler, workers=4, maxsize=500, drain_timeout=20.0, name="jobs"):
+        self.handler = handler
+        self.drain_timeout = drain_timeout
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.name = name
+        self._queues = [queue.Queue(maxsize=max(1, maxsize // self.workers)) for _ in range(self.workers)]
+        self._next = 0
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.submitted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.high_water = 0
+        self.total_wait = 0.0
+
+    # Threads are started lazily so the pool is created inside the gunicorn
+    # worker process even when the app module is imported before the fork.
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i, shard in enumerate(self._queues):
+                t = threading.Thread(target=self._run, args=(shard,), name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            # Drain at interpreter exit before the ThreadPoolExecutors shut
+            # down: these hooks run in reverse order, ahead of atexit, and
+            # ours is registered after concurrent.futures has been imported
+            threading._register_atexit(self.shutdown)
+
+    def _shard(self, key):
+        if key is None:
+            with self._lock:
+                self._next = (self._next + 1) % self.workers
+                return self._queues[self._next]
+        return self._queues[zlib.crc32(str(key).encode("utf-8")) % self.workers]
+
+    def depth(self):
+        return sum(shard.qsize() for shard in self._queues)
+
+    def submit(self, job, timeout=0.0, key=None):
+        """Enqueue a job. Returns False when its shard is full or the queue is shutting down."""
+        if self._closed:
+            return False
+        self._ensure_started()
+        shard = self._shard(key)
+        try:
+            if timeout > 0:
+                shard.put((time.monotonic(), job), timeout=timeout)
+            else:
+                shard.put_nowait((time.monotonic(), job))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+            self.high_water = max(self.high_water, self.depth())
+        return True
+
+    def _run(self, shard):
+        while True:
+            item = shard.get()
+            if item is _STOP:
+                shard.task_done()
+                return
+
+            enqueued_at, job = item
+            with self._lock:
+                self.busy += 1
+                self.total_wait += time.monotonic() - enqueued_at
+            try:
+                self.handler(job)
+                ok = True
+            except Exception:
+                log.exception("job failed", extra={"queue": self.name})
+                ok = False
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    self.processed += 1
+                    if not ok:
+                        self.failed += 1
+                shard.task_done()
+
+    def shutdown(self, timeout=None):
+        """Stop accepting jobs, finish everything already queued, then stop the workers."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._threads:
+            return
+
+        if timeout is None:
+            timeout = self.drain_timeout
+        deadline = time.monotonic() + timeout
+        for shard in self._queues:
+            try:
+                shard.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+        left = self.depth()
+        if left:
+            log.warning("shutdown timed out", extra={"queue": self.name, "jobs_left": left})
+
+    def stats(self):
+        with self._lock:
+            processed = self.processed
+            return {
+                "depth": self.depth(),
+                "maxsize": self.maxsize,
+                "workers": self.workers,
+                "busy": self.busy,
+                "submitted": self.submitted,
+                "processed": processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "high_water": self.high_water,
+                "avg_wait_ms": round(self.total_wait / processed * 1000, 3) if processed else 0.0,
+                "closed": self._closed,
+            }
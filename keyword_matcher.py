@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"\w+")
+
+# A matched rule. Lower ``priority`` wins: abuse first, then FAQ entries in
+# file order, then Gemini topics in declaration order.
+Rule = namedtuple("Rule", ["category", "key", "priority", "response"])
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+
+def _trie_pattern(words):
+    # Prefix-factored alternation, so the regex engine follows one path per
+    # position instead of trying every stem
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if end else group
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Word-boundary keyword matcher over the abuse list, FAQ and Gemini topics.
+
+    Every keyword (single word or phrase) is stored once in a dict keyed by
+    its normalized token sequence, so a message is matched in one pass over
+    its tokens: cost grows with message length and the longest phrase, not
+    with the number of keywords.
+
+    ``abusive_prefixes`` is an opt-in list of abuse stems that also match
+    with any ending ("fuck" -> "fucking", "bitch" -> "bitches"). They are
+    compiled into one trie-shaped regex anchored at the start of a word.
+    """
+
+    def __init__(self, abusive_keywords=(), faq=None, topic_keywords=None, abusive_prefixes=()):
+        self._phrases = {}
+        self._prefix_re = None
+        self.abuse_prefixes = 0
+        self.rules = []
+        self.max_words = 1
+
+        if abusive_keywords or abusive_prefixes:
+            rule = Rule("abuse", "abuse", len(self.rules), None)
+            self._add_rule(rule, abusive_keywords)
+            prefixes = [w for w in map(str.lower, abusive_prefixes) if WORD_RE.fullmatch(w)]
+            if prefixes:
+                self._prefix_re = re.compile(r"\b" + _trie_pattern(prefixes))
+                self._prefix_rule = rule
+                self.abuse_prefixes = len(prefixes)
+
+        for key, entry in (faq or {}).items():
+            if isinstance(entry, dict) and "keywords" in entry:
+                rule = Rule("faq", key, len(self.rules), entry.get("response"))
+                self._add_rule(rule, entry["keywords"])
+
+        for topic, keywords in (topic_keywords or {}).items():
+            self._add_rule(Rule("gemini", topic, len(self.rules), None), keywords)
+
+    def _add_rule(self, rule, keywords):
+        self.rules.append(rule)
+        for keyword in keywords:
+            tokens = tokenize(keyword)
+            if not tokens:
+                continue
+            phrase = " ".join(tokens)
+            # Keep the first (highest priority) rule for shared keywords
+            if phrase not in self._phrases:
+                self._phrases[phrase] = rule
+                self.max_words = max(self.max_words, len(tokens))
+
+    def match(self, text, categories=None):
+        """Return the winning Rule for ``text`` or None."""
+        if self._prefix_re is not None and (not categories or "abuse" in categories):
+            if self._prefix_re.search(text.lower()):
+                return self._prefix_rule
+
+        tokens = tokenize(text)
+        phrases = self._phrases
+        best = None
+        for i in range(len(tokens)):
+            phrase = None
+            for n in range(min(self.max_words, len(tokens) - i)):
+                phrase = tokens[i] if n == 0 else phrase + " " + tokens[i + n]
+                rule = phrases.get(phrase)
+                if rule is None or (categories and rule.category not in categories):
+                    continue
+                if best is None or rule.priority < best.priority:
+                    best = rule
+                    if best.priority == 0:
+                        return best
+        return best
+
+    def stats(self):
+        return {
+            "rules": len(self.rules),
+            "keywords": len(self._phrases),
+            "abuse_prefixes": self.abuse_prefixes,
+            "max_words": self.max_words,
+        }
+
+
+class ReloadingMatcher:
+    """Holds a KeywordMatcher and rebuilds it when the FAQ file changes on disk.
+
+    The file is stat'ed at most once per ``check_interval`` seconds. A new
+    matcher is built off to the side and swapped in with a single assignment,
+    so concurrent readers always see either the old or the new one.
+    """
+
+    def __init__(self, faq_path, abusive_keywords=(), topic_keywords=None, check_interval=2.0,
+                 abusive_prefixes=()):
+        self.faq_path = faq_path
+        self.abusive_keywords = abusive_keywords
+        self.abusive_prefixes = abusive_prefixes
+        self.topic_keywords = topic_keywords
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self.builds = 0
+        self.faq = {}
+        self.matcher = KeywordMatcher()
+        self._reload()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.faq_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _reload(self):
+        mtime = self._file_mtime()
+        faq = {}
+        if mtime is not None:
+            try:
+                with open(self.faq_path, "r") as f:
+                    faq = json.load(f)
+            except (OSError, ValueError) as e:
+                # Keep serving the previous rules until the file is valid again
+                log.warning("could not reload faq", extra={"path": self.faq_path, "error": str(e)})
+                self._mtime = mtime
+                return
+        matcher = KeywordMatcher(self.abusive_keywords, faq, self.topic_keywords, self.abusive_prefixes)
+        self.faq, self.matcher, self._mtime = faq, matcher, mtime
+        self.builds += 1
+
+    def get(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    if self._file_mtime() != self._mtime:
+                        self._reload()
+        return self.matcher
+
+    def match(self, text, categories=None):
+        return self.get().match(text, categories)
+
+    def stats(self):
+        return dict(self.matcher.stats(), builds=self.builds)
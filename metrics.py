@@ -0,0 +1,161 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for in-process stages (sub-ms) and remote calls (seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """In-process counters and latency histograms, rendered in Prometheus text format.
+
+    Values are per process: with several gunicorn workers each one reports
+    its own series.
+    """
+
+    def __init__(self, prefix="chatbot"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def stage(self, stage):
+        return self.timer("stage_seconds", stage=stage)
+
+    def register_collector(self, name, collect):
+        """Export the numeric fields of ``collect()`` (a dict, may be nested) as gauges."""
+        self._collectors.append((name, collect))
+
+    def _name(self, name):
+        return f"{self.prefix}_{name}"
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = [(key, h.buckets, list(h.counts), h.sum, h.count)
+                          for key, h in sorted(self._histograms.items())]
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            full = self._name(name)
+            if full not in typed:
+                lines.append(f"# TYPE {full} counter")
+                typed.add(full)
+            lines.append(f"{full}{self._labels(labels)} {value}")
+
+        for (name, labels), buckets, counts, total, count in histograms:
+            full = self._name(name)
+            if full not in typed:
+                lines.append(f"# TYPE {full} histogram")
+                typed.add(full)
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{full}_bucket{self._labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{full}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{full}_sum{self._labels(labels)} {total}")
+            lines.append(f"{full}_count{self._labels(labels)} {count}")
+
+        for name, collect in self._collectors:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, value in _flatten(values, name):
+                full = self._name(key)
+                lines.append(f"# TYPE {full} gauge")
+                lines.append(f"{full} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(values, prefix):
+    if isinstance(values, dict):
+        for key, value in values.items():
+            yield from _flatten(value, f"{prefix}_{key}")
+    elif isinstance(values, bool):
+        yield prefix, int(values)
+    elif isinstance(values, (int, float)):
+        yield prefix, values
+
+
+def parse_histograms(text, name):
+    """Read ``name`` histogram buckets back from rendered text: {labels: [(le, cumulative)]}."""
+    series = {}
+    marker = f"{name}_bucket{{"
+    for line in text.splitlines():
+        if not line.startswith(marker):
+            continue
+        labels_part, value = line[len(marker):].rsplit("} ", 1)
+        labels = dict(pair.split("=", 1) for pair in labels_part.split(","))
+        le = labels.pop("le").strip('"')
+        key = tuple(sorted((k, v.strip('"')) for k, v in labels.items()))
+        series.setdefault(key, []).append((float("inf") if le == "+Inf" else float(le), float(value)))
+    return series
+
+
+def quantile(buckets, q):
+    """Estimate a quantile from cumulative (le, count) buckets by linear interpolation."""
+    if not buckets or buckets[-1][1] == 0:
+        return None
+    total = buckets[-1][1]
+    rank = q * total
+    prev_bound, prev_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return prev_bound
+            if count == prev_count:
+                return bound
+            return prev_bound + (bound - prev_bound) * (rank - prev_count) / (count - prev_count)
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+metrics = Metrics()
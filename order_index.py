@@ -0,0 +1,274 @@
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+log = logging.getLogger(__name__)
+
+# REST webhook fulfillment_status -> GraphQL displayFulfillmentStatus
+FULFILLMENT_STATUS = {
+    None: "UNFULFILLED",
+    "fulfilled": "FULFILLED",
+    "partial": "PARTIALLY_FULFILLED",
+    "restocked": "RESTOCKED",
+}
+
+BULK_ORDERS_QUERY = """
+{
+  orders {
+    edges {
+      node {
+        legacyResourceId
+        name
+        displayFulfillmentStatus
+        updatedAt
+        phone
+        customer { firstName phone }
+      }
+    }
+  }
+}
+"""
+
+BULK_RUN_MUTATION = """
+mutation RunBulk($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+BULK_STATUS_QUERY = """
+{
+  currentBulkOperation { id status errorCode objectCount url }
+}
+"""
+
+
+def normalize_phone(phone):
+    """Normalize to the "+91XXXXXXXXXX" form extract_phone_number produces."""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 10:
+        return "+91" + digits
+    if len(digits) == 12 and digits.startswith("91"):
+        return "+" + digits
+    if len(digits) == 11 and digits.startswith("0"):
+        return "+91" + digits[1:]
+    return "+" + digits if digits else None
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return time.time()
+
+
+def _order_phones(order):
+    # Only numbers that identify the buyer. Billing and shipping phones often
+    # belong to someone else (a gift recipient, a relative), and indexing
+    # them would show that person this customer's order.
+    customer = order.get("customer") or {}
+    candidates = [customer.get("phone"), order.get("phone")]
+    phones = []
+    for phone in map(normalize_phone, candidates):
+        if phone and phone not in phones:
+            phones.append(phone)
+    return phones
+
+
+class OrderIndex:
+    """Latest order name and fulfillment status per phone number, in SQLite (WAL).
+
+    Rows only move forward: a newer order id replaces the stored order, and
+    for the same order an event older than the stored one is ignored, so
+    out-of-order webhook deliveries can't roll a status back.
+    """
+
+    def __init__(self, path="orders.db"):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS latest_orders ("
+            " phone TEXT PRIMARY KEY,"
+            " order_id INTEGER NOT NULL,"
+            " order_name TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " first_name TEXT,"
+            " updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS latest_orders_order_id ON latest_orders (order_id)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, phone):
+        row = self._conn().execute(
+            "SELECT order_name, status, first_name FROM latest_orders WHERE phone = ?",
+            (normalize_phone(phone),),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"name": row[0], "status": row[1], "first_name": row[2]}
+
+    def upsert(self, phone, order_id, order_name, status, first_name=None, updated_at=None, conn=None):
+        (conn or self._conn()).execute(
+            "INSERT INTO latest_orders (phone, order_id, order_name, status, first_name, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(phone) DO UPDATE SET"
+            "  order_id = excluded.order_id, order_name = excluded.order_name,"
+            "  status = excluded.status, first_name = COALESCE(excluded.first_name, first_name),"
+            "  updated_at = excluded.updated_at"
+            " WHERE excluded.order_id > latest_orders.order_id"
+            "  OR (excluded.order_id = latest_orders.order_id AND excluded.updated_at >= latest_orders.updated_at)",
+            (phone, int(order_id), order_name, status, first_name, updated_at or time.time()),
+        )
+        with self._lock:
+            self.updates += 1
+
+    def apply_order(self, order, conn=None):
+        status = FULFILLMENT_STATUS.get(order.get("fulfillment_status"), "UNFULFILLED")
+        first_name = (order.get("customer") or {}).get("first_name")
+        updated_at = _timestamp(order.get("updated_at"))
+        for phone in _order_phones(order):
+            self.upsert(phone, order["id"], order["name"], status, first_name, updated_at, conn)
+
+    def apply_fulfillment(self, fulfillment):
+        # Fulfillment events only carry the order id; orders/updated follows
+        # with the exact (possibly partial) status
+        if fulfillment.get("status") != "success":
+            return
+        self._conn().execute(
+            "UPDATE latest_orders SET status = ?, updated_at = ?"
+            " WHERE order_id = ? AND updated_at <= ?",
+            ("FULFILLED", _timestamp(fulfillment.get("updated_at")), int(fulfillment["order_id"]),
+             _timestamp(fulfillment.get("updated_at"))),
+        )
+        with self._lock:
+            self.updates += 1
+
+    def apply_webhook(self, topic, payload):
+        """Apply a Shopify webhook. Returns False for topics the index doesn't track."""
+        if topic in ("orders/create", "orders/updated", "orders/fulfilled", "orders/partially_fulfilled"):
+            self.apply_order(payload)
+            return True
+        if topic in ("fulfillments/create", "fulfillments/update"):
+            self.apply_fulfillment(payload)
+            return True
+        return False
+
+    def apply_bulk_lines(self, lines, batch_size=1000):
+        """Load GraphQL bulk export JSONL lines (see BULK_ORDERS_QUERY). Returns orders loaded."""
+        conn = self._conn()
+        count = 0
+        conn.execute("BEGIN")
+        try:
+            for line in lines:
+                if not line:
+                    continue
+                node = json.loads(line)
+                order = {
+                    "id": node["legacyResourceId"],
+                    "name": node["name"],
+                    "updated_at": node.get("updatedAt"),
+                    "phone": node.get("phone"),
+                    "customer": {
+                        "first_name": (node.get("customer") or {}).get("firstName"),
+                        "phone": (node.get("customer") or {}).get("phone"),
+                    },
+                }
+                status = node.get("displayFulfillmentStatus") or "UNFULFILLED"
+                for phone in _order_phones(order):
+                    self.upsert(phone, order["id"], order["name"], status,
+                                order["customer"]["first_name"], _timestamp(order["updated_at"]), conn)
+                count += 1
+                if count % batch_size == 0:
+                    conn.execute("COMMIT")
+                    conn.execute("BEGIN")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def stats(self):
+        size = self._conn().execute("SELECT COUNT(*) FROM latest_orders").fetchone()[0]
+        with self._lock:
+            return {
+                "path": self.path,
+                "size": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "updates": self.updates,
+            }
+
+
+def backfill(index, client, poll_interval=5.0):
+    """Fill the index from a Shopify bulk operation export of all orders."""
+    data = client.execute(BULK_RUN_MUTATION, {"query": BULK_ORDERS_QUERY})
+    errors = data["bulkOperationRunQuery"]["userErrors"]
+    if errors:
+        raise RuntimeError(f"Bulk operation rejected: {errors}")
+
+    while True:
+        operation = client.execute(BULK_STATUS_QUERY)["currentBulkOperation"]
+        status = operation["status"]
+        log.info("bulk operation", extra={"status": status, "objects": operation.get("objectCount")})
+        if status == "COMPLETED":
+            break
+        if status in ("FAILED", "CANCELED", "EXPIRED"):
+            raise RuntimeError(f"Bulk operation {status}: {operation.get('errorCode')}")
+        time.sleep(poll_interval)
+
+    if not operation.get("url"):
+        log.info("bulk export is empty")
+        return 0
+    # The export URL is pre-signed storage, not the Admin API: fetch it
+    # without the client's session so the access token is not sent along
+    with requests.get(operation["url"], stream=True, timeout=client.timeout) as response:
+        response.raise_for_status()
+        count = index.apply_bulk_lines(line.decode("utf-8") for line in response.iter_lines())
+    log.info("order index backfilled", extra={"orders": count})
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local order-status index")
+    parser.add_argument("command", choices=["backfill", "stats"])
+    args = parser.parse_args()
+
+    from shopify_utils import order_index, shopify_client
+    from structured_log import configure_logging
+
+    configure_logging()
+
+    if args.command == "backfill":
+        backfill(order_index, shopify_client)
+    print(json.dumps(order_index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
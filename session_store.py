@@ -0,0 +1,222 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class DictSessionStore:
+    """The original behaviour: an unbounded dict local to this worker."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_stage(self, user_id):
+        session = self.sessions.get(user_id)
+        if session is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return session.get("stage")
+
+    def set_stage(self, user_id, stage):
+        self.sessions.setdefault(user_id, {})["stage"] = stage
+
+    def stats(self):
+        return {
+            "backend": "dict",
+            "size": len(self.sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": 0,
+            "memory_bytes": sys.getsizeof(self.sessions)
+            + sum(sys.getsizeof(s) for s in self.sessions.values()),
+        }
+
+
+class Session:
+    __slots__ = ("stage", "expires_at")
+
+    def __init__(self, stage, expires_at):
+        self.stage = stage
+        self.expires_at = expires_at
+
+
+class LRUSessionStore:
+    """Bounded in-process store: least recently used sessions go first.
+
+    A session expires ``ttl`` seconds after its stage was last set; reading
+    it does not extend that.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_stage(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                self.misses += 1
+                return None
+            if session.expires_at <= now:
+                del self._sessions[user_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(user_id)
+            self.hits += 1
+            return session.stage
+
+    def set_stage(self, user_id, stage):
+        with self._lock:
+            # A session without a stage carries no state, don't keep it around
+            if stage is None:
+                self._sessions.pop(user_id, None)
+                return
+            self._sessions[user_id] = Session(stage, time.monotonic() + self.ttl)
+            self._sessions.move_to_end(user_id)
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            size = len(self._sessions)
+            # Slotted records have a fixed size; keys are short phone-number strings
+            record = sys.getsizeof(Session(None, 0.0))
+            keys = sum(sys.getsizeof(k) for k in self._sessions)
+            return {
+                "backend": "lru",
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "memory_bytes": sys.getsizeof(self._sessions) + keys + size * record,
+            }
+
+
+class SQLiteSessionStore:
+    """File-backed store in WAL mode, shared by every gunicorn worker on the host.
+
+    Lookups and writes hit the primary key, so both are a single B-tree probe.
+    As with the LRU store, ``ttl`` counts from the last write. Expired rows are purged, and the table is trimmed back to ``maxsize``,
+    every ``purge_every`` writes.
+    """
+
+    def __init__(self, path="sessions.db", maxsize=100000, ttl=3600, purge_every=500):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " user_id TEXT PRIMARY KEY,"
+            " stage TEXT,"
+            " expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    # sqlite3 connections can't be shared across threads, keep one per thread
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_stage(self, user_id):
+        row = self._conn().execute(
+            "SELECT stage FROM sessions WHERE user_id = ? AND expires_at > ?",
+            (user_id, time.time()),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set_stage(self, user_id, stage):
+        conn = self._conn()
+        if stage is None:
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            return
+        conn.execute(
+            "INSERT INTO sessions (user_id, stage, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(user_id) DO UPDATE SET stage = excluded.stage, expires_at = excluded.expires_at",
+            (user_id, stage, time.time() + self.ttl),
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def purge(self):
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        removed += conn.execute(
+            "DELETE FROM sessions WHERE user_id IN ("
+            " SELECT user_id FROM sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        ).rowcount
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        size = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        disk = 0
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                disk += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_bytes": disk,
+            }
+
+
+def create_session_store(backend="dict", maxsize=10000, ttl=3600, path="sessions.db"):
+    backend = (backend or "dict").lower()
+    if backend == "dict":
+        return DictSessionStore()
+    if backend == "lru":
+        return LRUSessionStore(maxsize=maxsize, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path=path, maxsize=maxsize, ttl=ttl)
+    raise ValueError(f"Unknown session backend: {backend}")
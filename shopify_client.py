@@ -0,0 +1,180 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Only the latest order's name and status are shown to the customer
+LATEST_ORDER_QUERY = """
+query LatestOrder($query: String!) {
+  customers(first: 1, query: $query) {
+    nodes {
+      firstName
+      orders(first: 1, reverse: true) {
+        nodes {
+          name
+          displayFulfillmentStatus
+        }
+      }
+    }
+  }
+}
+"""
+
+
+class ShopifyError(Exception):
+    pass
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ShopifyClient:
+    """Admin GraphQL client with a pooled session, request coalescing and cost-aware pacing.
+
+    Concurrent lookups for the same phone number share one in-flight request.
+    The throttle status Shopify returns in ``extensions.cost`` is tracked so
+    that calls wait for the bucket to refill instead of being rejected. Each
+    dispatched call reserves its expected cost until its response arrives,
+    so a burst of concurrent calls can't all spend the same points.
+    """
+
+    def __init__(self, api_url, access_token, pool_size=10, timeout=(3.05, 10),
+                 max_retries=2, max_wait=5.0):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "X-Shopify-Access-Token": access_token or ""
+        })
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # Last throttle status seen: points available, restore rate, when seen
+        self._available = None
+        self._restore_rate = 50.0
+        self._seen_at = 0.0
+        self._last_cost = 10.0
+        self._reserved = 0.0
+
+        self.requests = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.paced_wait = 0.0
+        self.errors = 0
+
+    def _pace(self):
+        """Reserve the expected cost, waiting for it if the bucket is short. Returns the reservation."""
+        with self._lock:
+            cost = self._last_cost
+            wait = 0.0
+            if self._available is not None:
+                available = (self._available + (time.monotonic() - self._seen_at) * self._restore_rate
+                             - self._reserved)
+                shortfall = cost - available
+                wait = min(self.max_wait, shortfall / self._restore_rate) if shortfall > 0 else 0.0
+                self.paced_wait += wait
+            self._reserved += cost
+        if wait > 0:
+            time.sleep(wait)
+        return cost
+
+    def _release(self, cost):
+        with self._lock:
+            self._reserved -= cost
+
+    def _track_cost(self, body):
+        cost = (body.get("extensions") or {}).get("cost") or {}
+        status = cost.get("throttleStatus") or {}
+        with self._lock:
+            if "currentlyAvailable" in status:
+                self._available = float(status["currentlyAvailable"])
+                self._restore_rate = float(status.get("restoreRate") or self._restore_rate)
+                self._seen_at = time.monotonic()
+            if cost.get("requestedQueryCost"):
+                self._last_cost = float(cost["requestedQueryCost"])
+
+    def execute(self, query, variables=None):
+        """Run a GraphQL query and return its ``data``. Raises ShopifyError on failure."""
+        for attempt in range(self.max_retries + 1):
+            reserved = self._pace()
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.session.post(self.api_url, json={"query": query, "variables": variables or {}},
+                                             timeout=self.timeout)
+                if response.status_code != 200:
+                    with self._lock:
+                        self.errors += 1
+                    raise ShopifyError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+                body = response.json()
+                self._track_cost(body)
+            finally:
+                self._release(reserved)
+            errors = body.get("errors") or []
+            if any((e.get("extensions") or {}).get("code") == "THROTTLED" for e in errors):
+                with self._lock:
+                    self.throttled += 1
+                if attempt < self.max_retries:
+                    continue
+            if errors:
+                with self._lock:
+                    self.errors += 1
+                raise ShopifyError(errors[0].get("message", "GraphQL error"))
+            return body.get("data") or {}
+
+    def latest_order_by_phone(self, phone_number):
+        """Return the matching customer node (firstName + latest order), or None."""
+        with self._lock:
+            call = self._inflight.get(phone_number)
+            leader = call is None
+            if leader:
+                call = self._inflight[phone_number] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            data = self.execute(LATEST_ORDER_QUERY, {"query": f"phone:{phone_number}"})
+            customers = (data.get("customers") or {}).get("nodes") or []
+            call.result = customers[0] if customers else None
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[phone_number]
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "throttled": self.throttled,
+                "errors": self.errors,
+                "paced_wait_s": round(self.paced_wait, 3),
+                "points_reserved": self._reserved,
+                "points_available": self._available,
+                "restore_rate": self._restore_rate,
+            }
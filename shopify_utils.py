@@ -1,49 +1,34 @@
+import logging
 import os
-import requests
 from dotenv import load_dotenv
+from shopify_client import ShopifyClient, ShopifyError
+from order_index import OrderIndex
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 SHOPIFY_API_URL = os.getenv("SHOPIFY_API_URL")
 SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
+SHOPIFY_TIMEOUT = float(os.getenv("SHOPIFY_TIMEOUT", 10))
+
+# Local copy of each customer's latest order, kept current by Shopify order
+# webhooks. Set ORDER_INDEX_PATH to an empty string to always ask Shopify.
+ORDER_INDEX_PATH = os.getenv("ORDER_INDEX_PATH", "orders.db")
 
-HEADERS = {
-    "Content-Type": "application/json",
-    "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
-}
-
-QUERY_TEMPLATE = """
-query GetCustomers {
-  customers(first: 1, query: "phone:%s") {
-    nodes {
-      firstName
-      lastName
-      phone
-      orders(first: 5, reverse: true) {
-        nodes {
-          name
-          displayFulfillmentStatus
-        }
-      }
-    }
-  }
-}
-"""
+shopify_client = ShopifyClient(SHOPIFY_API_URL, SHOPIFY_ACCESS_TOKEN, timeout=(3.05, SHOPIFY_TIMEOUT))
+order_index = OrderIndex(ORDER_INDEX_PATH) if ORDER_INDEX_PATH else None
 
 def fetch_order_status_by_phone(phone_number: str) -> str:
-    query = QUERY_TEMPLATE % phone_number
     try:
-        response = requests.post(SHOPIFY_API_URL, headers=HEADERS, json={"query": query})
-        if response.status_code != 200:
-            print("⚠️ Shopify API error:", response.text)
-            return "❌ Unable to fetch your order details right now. Please try again later."
-
-        data = response.json()
-        customers = data.get("data", {}).get("customers", {}).get("nodes", [])
-        if not customers:
+        order = order_index.lookup(phone_number) if order_index else None
+        if order:
+            return f"📦 Order *{order['name']}* is currently: *{order['status']}*."
+
+        customer = shopify_client.latest_order_by_phone(phone_number)
+        if not customer:
             return f"❌ No customer found with phone number: {phone_number}"
 
-        customer = customers[0]
         orders = customer.get("orders", {}).get("nodes", [])
         if not orders:
             return f"📭 No orders found for {customer.get('firstName', 'this customer')}."
@@ -51,8 +36,9 @@ def fetch_order_status_by_phone(phone_number: str) -> str:
         latest_order = orders[0]
         return f"📦 Order *{latest_order['name']}* is currently: *{latest_order['displayFulfillmentStatus']}*."
 
-    except Exception as e:
-        print("❌ Shopify Exception:", e)
+    except ShopifyError as e:
+        log.warning("shopify api error", extra={"error": str(e)})
+        return "❌ Unable to fetch your order details right now. Please try again later."
+    except Exception:
+        log.exception("shopify lookup failed")
         return "⚠️ Internal error while checking your order. Please try again soon."
-
-
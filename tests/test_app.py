@@ -0,0 +1,51 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("requests")
+pytest.importorskip("google.genai")
+
+SECRET = "test-secret"
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("app")
+    os.environ.update(
+        SHOPIFY_WEBHOOK_SECRET=SECRET,
+        ORDER_INDEX_PATH=str(workdir / "orders.db"),
+        GEMINI_API_URL="http://127.0.0.1:9",
+        GEMINI_CACHE_PATH="",
+    )
+    import app
+
+    return app.app.test_client()
+
+
+def post_shopify(client, body, topic="orders/updated"):
+    data = json.dumps(body).encode()
+    signature = base64.b64encode(hmac.new(SECRET.encode(), data, hashlib.sha256).digest()).decode()
+    return client.post("/shopify/webhook", data=data, headers={
+        "X-Shopify-Hmac-Sha256": signature, "X-Shopify-Topic": topic,
+    })
+
+
+def test_shopify_webhook_applies_signed_orders(client):
+    order = {"id": 1001, "name": "#1001", "fulfillment_status": "fulfilled",
+             "updated_at": "2026-01-01T10:00:00Z", "customer": {"phone": "9876543210"}}
+    assert post_shopify(client, order).status_code == 200
+
+
+@pytest.mark.parametrize("body", [[], "order", 42, None])
+def test_shopify_webhook_rejects_non_object_bodies(client, body):
+    assert post_shopify(client, body).status_code == 400
+
+
+def test_shopify_webhook_rejects_bad_signature(client):
+    response = client.post("/shopify/webhook", data=b"{}", headers={"X-Shopify-Hmac-Sha256": "bad"})
+    assert response.status_code == 401
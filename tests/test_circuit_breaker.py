@@ -0,0 +1,82 @@
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("circuit_breaker.time.monotonic", lambda: now[0])
+    return now
+
+
+def open_breaker(breaker, failures=3):
+    for _ in range(failures):
+        assert breaker.allow()
+        breaker.record(0.1, ok=False)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    open_breaker(breaker, 2)
+    assert breaker.state == CLOSED
+    breaker.record(0.1, ok=False)
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 1
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    open_breaker(breaker, 2)
+    breaker.record(0.1)
+    open_breaker(breaker, 2)
+    assert breaker.state == CLOSED
+
+
+def test_rejects_during_cooldown_then_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    open_breaker(breaker)
+    clock[0] += 9
+    assert not breaker.allow()
+
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_probe_outcome_closes_or_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    open_breaker(breaker)
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record(0.1, ok=False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_lost_probe_is_replaced_after_another_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    open_breaker(breaker, 1)
+    clock[0] += 10
+    assert breaker.allow()
+    clock[0] += 5
+    assert not breaker.allow()
+    clock[0] += 5
+    assert breaker.allow()
+
+
+def test_slow_successes_count_as_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10, slow_call=1.0)
+    breaker.record(1.5)
+    breaker.record(2.0)
+    assert breaker.state == OPEN
+    stats = breaker.stats()
+    assert (stats["slow_calls"], stats["failures"], stats["successes"]) == (2, 0, 0)
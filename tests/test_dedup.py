@@ -0,0 +1,32 @@
+import time
+
+from dedup import SeenIds
+
+
+def test_duplicate_is_rejected_until_ttl_expires():
+    seen = SeenIds(maxsize=10, ttl=0.05)
+    assert seen.add("a")
+    assert not seen.add("a")
+    assert seen.stats()["duplicates"] == 1
+
+    time.sleep(0.06)
+    assert "a" not in seen
+    assert seen.add("a")
+    assert seen.stats()["expired"] == 1
+
+
+def test_oldest_ids_are_evicted_past_maxsize():
+    seen = SeenIds(maxsize=2, ttl=60)
+    for item in ("a", "b", "c"):
+        seen.add(item)
+    assert len(seen) == 2
+    assert "a" not in seen
+    assert "b" in seen and "c" in seen
+    assert seen.stats()["evicted"] == 1
+
+
+def test_discard_allows_redelivery():
+    seen = SeenIds(maxsize=10, ttl=60)
+    seen.add("a")
+    seen.discard("a")
+    assert seen.add("a")
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from gemini_cache import ResponseCache, normalize
+
+
+def test_normalize_folds_case_repeats_and_spellings():
+    assert normalize("Plz tell me KESE use kareeee!!") == "please tell me kaise use karee"
+    # Short English words are left alone
+    assert normalize("he said h") == "he said h"
+
+
+@pytest.mark.parametrize("text", ["🙏🙏", "???", "  ", "👍!"])
+def test_messages_without_words_are_not_cached(text):
+    cache = ResponseCache(threshold=0.8)
+    cache.put(text, "Thank you!")
+    assert cache.get(text) is None
+    assert cache.get("🙂") is None
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["uncacheable"] == 2
+
+
+def test_exact_and_near_hits():
+    cache = ResponseCache(threshold=0.5)
+    cache.put("how to use kumkumadi oil", "Apply at night.")
+    assert cache.get("How to use KUMKUMADI oil??") == "Apply at night."
+    assert cache.get("how to use kumkumadi oils") == "Apply at night."
+    assert cache.get("refund for broken bottle") is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["near_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("gemini_cache.time.time", lambda: clock[0])
+    cache = ResponseCache(maxsize=2, ttl=10, threshold=1)
+    cache.put("first question", "a")
+    cache.put("second question", "b")
+    cache.get("first question")
+    cache.put("third question", "c")
+    assert cache.get("second question") is None
+    assert cache.get("first question") == "a"
+
+    clock[0] += 11
+    assert cache.get("first question") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_save_and_reload_skips_empty_keys(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = ResponseCache(threshold=1, path=str(path))
+    cache.put("dosha quiz", "Start with 1")
+    cache.save()
+    rows = json.loads(path.read_text())
+    rows.append(["", "stale", rows[0][2], 0.0])
+    path.write_text(json.dumps(rows))
+
+    reloaded = ResponseCache(threshold=1, path=str(path))
+    assert reloaded.get("Dosha quiz") == "Start with 1"
+    assert reloaded.stats()["size"] == 1
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("is shilajit safe during pregnancy", "is shilajit not safe during pregnancy"),
+    ("is it safe for a 5 year old", "is it safe for a 50 year old"),
+    ("can i take ashwagandha with milk", "can i take ashwagandha without milk"),
+    ("should i apply it daily", "shouldn't i apply it daily"),
+])
+def test_near_hits_need_same_numbers_and_negations(cached, asked):
+    # Low threshold, so only the number/negation check can turn these away
+    cache = ResponseCache(threshold=0.7)
+    cache.put(cached, "cached advice")
+    assert cache.get(asked) is None
+    assert cache.get(cached) == "cached advice"
+
+
+def test_default_threshold_rejects_opposite_meanings():
+    cache = ResponseCache()
+    cache.put("is shilajit safe during pregnancy", "cached advice")
+    assert cache.get("is shilajit not safe during pregnancy") is None
+
+
+def test_near_hit_still_served_when_guards_agree():
+    cache = ResponseCache(threshold=0.7)
+    cache.put("is it safe for a 5 year old", "Ask a doctor first.")
+    assert cache.get("is it safe for my 5 year old??") == "Ask a doctor first."
+    assert cache.stats()["near_hits"] == 1
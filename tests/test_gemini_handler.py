@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("google.genai")
+os.environ.setdefault("GEMINI_API_URL", "http://127.0.0.1:9")
+os.environ.setdefault("GEMINI_CACHE_PATH", "")
+
+import gemini_handler  # noqa: E402
+
+
+def free_slots():
+    taken = 0
+    while gemini_handler.gemini_slots.acquire(blocking=False):
+        taken += 1
+    for _ in range(taken):
+        gemini_handler.gemini_slots.release()
+    return taken
+
+
+def test_failed_submit_gives_the_slot_back(monkeypatch):
+    stopped = ThreadPoolExecutor(max_workers=1)
+    stopped.shutdown()
+    monkeypatch.setattr(gemini_handler, "gemini_executor", stopped)
+    before = free_slots()
+
+    for _ in range(before + 2):
+        assert gemini_handler._submit("hello") is None
+    assert free_slots() == before
+
+
+def test_shutdown_falls_back_instead_of_raising(monkeypatch):
+    stopped = ThreadPoolExecutor(max_workers=1)
+    stopped.shutdown()
+    monkeypatch.setattr(gemini_handler, "gemini_executor", stopped)
+    reply = gemini_handler.ask_gemini("which serum for dry skin")
+    assert reply == gemini_handler.predefined_response("products")
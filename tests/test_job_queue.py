@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+from job_queue import JobQueue
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def test_jobs_with_the_same_key_run_in_order():
+    done = []
+    lock = threading.Lock()
+
+    def handler(job):
+        user, n = job
+        # Earlier jobs are slower, so any reordering would show up
+        time.sleep(0.01 * (5 - n))
+        with lock:
+            done.append(job)
+
+    jobs = JobQueue(handler, workers=4, maxsize=100)
+    for n in range(5):
+        for user in ("u1", "u2", "u3"):
+            assert jobs.submit((user, n), key=user)
+    jobs.shutdown(timeout=5)
+
+    for user in ("u1", "u2", "u3"):
+        assert [n for u, n in done if u == user] == list(range(5))
+    assert jobs.stats()["processed"] == 15
+
+
+def test_full_shard_rejects_and_counts():
+    release = threading.Event()
+    jobs = JobQueue(lambda job: release.wait(), workers=1, maxsize=1)
+    results = [jobs.submit(i, key="u") for i in range(5)]
+    release.set()
+    jobs.shutdown(timeout=5)
+
+    assert not all(results)
+    assert jobs.stats()["rejected"] == results.count(False)
+
+
+def test_handler_errors_are_counted_not_raised():
+    def handler(job):
+        raise ValueError("boom")
+
+    jobs = JobQueue(handler, workers=1, maxsize=10)
+    jobs.submit(1)
+    jobs.shutdown(timeout=5)
+    assert jobs.stats()["failed"] == 1
+
+
+def test_exit_drain_runs_before_executors_shut_down():
+    # Queued jobs that hand work to an executor (as ask_gemini does) must
+    # still succeed when the queue is drained at interpreter exit
+    script = textwrap.dedent("""
+        import atexit
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from job_queue import JobQueue
+
+        # Registered first, so it reports after any atexit-time drain
+        atexit.register(lambda: print(jobs.stats()["failed"], len(results)))
+        executor = ThreadPoolExecutor(max_workers=2)
+        results = []
+
+        def handler(job):
+            time.sleep(0.02)
+            results.append(executor.submit(lambda: job * 2).result())
+
+        jobs = JobQueue(handler, workers=1, maxsize=50)
+        for i in range(10):
+            jobs.submit(i)
+    """)
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=30)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split() == ["0", "10"]
@@ -0,0 +1,78 @@
+import json
+import os
+import time
+
+import pytest
+
+from keyword_matcher import KeywordMatcher, ReloadingMatcher
+
+ABUSE = ["fuck", "bitch", "mc", "69", "ling", "chut", "maal", "aand", "saala", "chod", "randi",
+         "suar", "loda", "suar ki aulad", "gaand mara"]
+PREFIXES = ["fuck", "motherfuck", "bitch", "bhosdi"]
+FAQ = {
+    "greeting": {"keywords": ["hi", "hello"], "response": "Namaste"},
+    "track order": {"keywords": ["track", "order"], "response": "Track here"},
+}
+TOPICS = {"products": ["face wash", "oil"], "wellness": ["stress", "dosha"], "quiz": ["quiz", "dosha"]}
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher(ABUSE, FAQ, TOPICS, abusive_prefixes=PREFIXES)
+
+
+@pytest.mark.parametrize("text", [
+    "fuck", "fucking hell", "you motherfucker", "bitches", "BITCH!", "mc", "call 69 now",
+    "suar ki aulad", "ling", "chut", "maal", "saala kutta", "bhosdike", "fuckoff",
+])
+def test_abuse_is_caught(matcher, text):
+    rule = matcher.match(text)
+    assert rule is not None and rule.category == "abuse"
+
+
+@pytest.mark.parametrize("text", [
+    "this is great", "I am feeling good", "parachute", "mcdonalds", "order 1690 please",
+    "pincode 569001", "kamaal ka product", "dhamaal", "maalish oil", "chaand", "masaala chai",
+    "chodo", "chodhary ji", "grandiose", "suarez", "lodash", "stripe", "uganda",
+])
+def test_no_abuse_inside_ordinary_words(matcher, text):
+    rule = matcher.match(text)
+    assert rule is None or rule.category != "abuse"
+
+
+def test_prefixes_only_match_at_word_start():
+    matcher = KeywordMatcher(abusive_prefixes=["fuck"])
+    assert matcher.match("fuckface").category == "abuse"
+    assert matcher.match("unfuckable") is None
+    assert matcher.stats()["abuse_prefixes"] == 1
+
+
+def test_faq_keywords_match_whole_words_only(matcher):
+    assert matcher.match("this is great") is None
+    assert matcher.match("hi there").key == "greeting"
+
+
+def test_priority_abuse_then_faq_then_topic(matcher):
+    assert matcher.match("hello fucking oil").category == "abuse"
+    assert matcher.match("track my face wash order").key == "track order"
+    assert matcher.match("which face wash").key == "products"
+    # Shared keyword goes to the first topic that declares it
+    assert matcher.match("my dosha").key == "wellness"
+
+
+def test_category_filter_skips_abuse(matcher):
+    assert matcher.match("fucking hello", categories=("faq",)).key == "greeting"
+
+
+def test_reloads_when_faq_file_changes(tmp_path):
+    path = tmp_path / "faq.json"
+    path.write_text(json.dumps({"a": {"keywords": ["foo"], "response": "A"}}))
+    reloading = ReloadingMatcher(str(path), check_interval=0)
+    assert reloading.match("foo").response == "A"
+
+    time.sleep(0.01)
+    path.write_text(json.dumps({"b": {"keywords": ["bar"], "response": "B"}}))
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert reloading.match("foo") is None
+    assert reloading.match("bar").response == "B"
+    assert reloading.stats()["builds"] == 2
@@ -0,0 +1,47 @@
+import pytest
+
+from metrics import Metrics, parse_histograms, quantile
+
+
+def test_render_parse_quantile_round_trip():
+    metrics = Metrics()
+    # 90 fast calls in (0.001, 0.0025], 10 slow ones in (0.25, 0.5]
+    for _ in range(90):
+        metrics.observe("stage_seconds", 0.002, stage="faq")
+    for _ in range(10):
+        metrics.observe("stage_seconds", 0.4, stage="faq")
+    metrics.observe("stage_seconds", 3.0, stage="gemini")
+
+    series = parse_histograms(metrics.render(), "chatbot_stage_seconds")
+    assert set(series) == {(("stage", "faq"),), (("stage", "gemini"),)}
+
+    faq = series[(("stage", "faq"),)]
+    assert faq[-1] == (float("inf"), 100.0)
+    assert 0.001 < quantile(faq, 0.5) <= 0.0025
+    assert 0.25 < quantile(faq, 0.95) <= 0.5
+    assert 2.5 < quantile(series[(("stage", "gemini"),)], 0.5) <= 5
+
+
+def test_quantile_edge_cases():
+    assert quantile([], 0.5) is None
+    assert quantile([(0.1, 0.0), (float("inf"), 0.0)], 0.5) is None
+    # Everything past the last finite bound: report that bound
+    assert quantile([(0.1, 0.0), (float("inf"), 4.0)], 0.99) == 0.1
+    assert quantile([(0.1, 2.0), (0.2, 4.0), (float("inf"), 4.0)], 0.5) == pytest.approx(0.1)
+
+
+def test_render_counters_timers_and_collectors():
+    metrics = Metrics()
+    metrics.inc("messages_total", route="faq")
+    metrics.inc("messages_total", 2, route="faq")
+    with metrics.stage("send"):
+        pass
+    metrics.register_collector("component", lambda: {"queue": {"depth": 3, "closed": False}, "name": "x"})
+    metrics.register_collector("broken", lambda: 1 / 0)
+
+    text = metrics.render()
+    assert 'chatbot_messages_total{route="faq"} 3' in text
+    assert 'chatbot_stage_seconds_count{stage="send"} 1' in text
+    assert "chatbot_component_queue_depth 3" in text
+    assert "chatbot_component_queue_closed 0" in text
+    assert "component_name" not in text and "broken" not in text
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+pytest.importorskip("requests")
+
+from order_index import OrderIndex, normalize_phone  # noqa: E402
+
+
+@pytest.fixture
+def index(tmp_path):
+    return OrderIndex(str(tmp_path / "orders.db"))
+
+
+def order(order_id, status=None, updated_at="2026-01-01T10:00:00Z", **extra):
+    payload = {
+        "id": order_id,
+        "name": f"#{order_id}",
+        "fulfillment_status": status,
+        "updated_at": updated_at,
+        "customer": {"first_name": "Asha", "phone": "+91 98765 43210"},
+    }
+    payload.update(extra)
+    return payload
+
+
+@pytest.mark.parametrize("raw", ["9876543210", "+91 98765-43210", "919876543210", "09876543210"])
+def test_normalize_phone(raw):
+    assert normalize_phone(raw) == "+919876543210"
+
+
+def test_newer_event_for_same_order_wins(index):
+    index.apply_order(order(1001))
+    index.apply_order(order(1001, "fulfilled", "2026-01-02T10:00:00Z"))
+    assert index.lookup("9876543210") == {"name": "#1001", "status": "FULFILLED", "first_name": "Asha"}
+
+
+def test_stale_event_does_not_roll_status_back(index):
+    index.apply_order(order(1001, "fulfilled", "2026-01-02T10:00:00Z"))
+    index.apply_order(order(1001, None, "2026-01-01T10:00:00Z"))
+    assert index.lookup("9876543210")["status"] == "FULFILLED"
+
+
+def test_older_order_does_not_replace_newer_one(index):
+    index.apply_order(order(1002, updated_at="2026-01-01T10:00:00Z"))
+    index.apply_order(order(1001, "fulfilled", "2026-01-05T10:00:00Z"))
+    assert index.lookup("9876543210")["name"] == "#1002"
+
+
+def test_only_buyer_numbers_are_indexed(index):
+    index.apply_order(order(
+        1001, phone="9000000001",
+        billing_address={"phone": "9000000002"},
+        shipping_address={"phone": "9000000003"},
+    ))
+    assert index.lookup("9876543210")["name"] == "#1001"
+    assert index.lookup("9000000001")["name"] == "#1001"
+    assert index.lookup("9000000002") is None
+    assert index.lookup("9000000003") is None
+
+
+def test_fulfillment_event_marks_order_fulfilled(index):
+    index.apply_order(order(1001))
+    index.apply_webhook("fulfillments/create", {
+        "order_id": 1001, "status": "success", "updated_at": "2026-01-02T10:00:00Z",
+    })
+    assert index.lookup("9876543210")["status"] == "FULFILLED"
+    assert not index.apply_webhook("products/update", {})
+
+
+def test_bulk_lines_skip_address_phones(index):
+    lines = [json.dumps({
+        "legacyResourceId": "1001", "name": "#1001", "displayFulfillmentStatus": "IN_PROGRESS",
+        "updatedAt": "2026-01-01T10:00:00Z", "phone": None,
+        "customer": {"firstName": "Asha", "phone": "9876543210"},
+        "shippingAddress": {"phone": "9000000003"},
+    })]
+    assert index.apply_bulk_lines(lines) == 1
+    assert index.lookup("+919876543210")["status"] == "IN_PROGRESS"
+    assert index.lookup("9000000003") is None
+    assert index.stats()["size"] == 1
@@ -0,0 +1,106 @@
+import pytest
+
+from session_store import (DictSessionStore, LRUSessionStore, SQLiteSessionStore,
+                           create_session_store)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("session_store.time.monotonic", lambda: now[0])
+    monkeypatch.setattr("session_store.time.time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["dict", "lru", "sqlite"])
+def store(request, tmp_path):
+    return create_session_store(request.param, path=str(tmp_path / "sessions.db"))
+
+
+def test_set_get_and_clear(store):
+    assert store.get_stage("u1") is None
+    store.set_stage("u1", "quiz_started")
+    assert store.get_stage("u1") == "quiz_started"
+    store.set_stage("u1", None)
+    assert store.get_stage("u1") is None
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_session_store("redis")
+
+
+def test_dict_store_keeps_everything():
+    store = DictSessionStore()
+    for i in range(100):
+        store.set_stage(f"u{i}", "quiz_started")
+    assert store.stats()["size"] == 100
+
+
+def test_lru_evicts_least_recently_used():
+    store = LRUSessionStore(maxsize=2, ttl=60)
+    store.set_stage("u1", "a")
+    store.set_stage("u2", "b")
+    store.get_stage("u1")
+    store.set_stage("u3", "c")
+
+    assert store.get_stage("u2") is None
+    assert store.get_stage("u1") == "a"
+    assert store.get_stage("u3") == "c"
+    assert store.stats()["evictions"] == 1
+
+
+def test_lru_ttl_counts_from_last_write(clock):
+    store = LRUSessionStore(maxsize=10, ttl=60)
+    store.set_stage("u1", "quiz_started")
+    clock[0] += 59
+    assert store.get_stage("u1") == "quiz_started"
+    clock[0] += 1
+    assert store.get_stage("u1") is None
+
+    stats = store.stats()
+    assert (stats["expirations"], stats["size"], stats["hits"], stats["misses"]) == (1, 0, 1, 1)
+
+
+def test_sqlite_upsert_and_ttl(tmp_path, clock):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+    store.set_stage("u1", "quiz_started")
+    clock[0] += 50
+    store.set_stage("u1", "quiz_done")
+    clock[0] += 50
+    assert store.get_stage("u1") == "quiz_done"
+    assert store.stats()["size"] == 1
+    clock[0] += 10
+    assert store.get_stage("u1") is None
+
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_sqlite_purge_drops_expired_and_trims_to_maxsize(tmp_path, clock):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), maxsize=3, ttl=60, purge_every=1000)
+    store.set_stage("old", "a")
+    clock[0] += 61
+    for i in range(5):
+        store.set_stage(f"u{i}", "a")
+        clock[0] += 1
+
+    assert store.purge() == 3
+    assert store.stats()["size"] == 3
+    assert store.stats()["evictions"] == 3
+    # The newest sessions survive the trim
+    assert [store.get_stage(f"u{i}") for i in range(5)] == [None, None, "a", "a", "a"]
+
+
+def test_sqlite_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(path).set_stage("u1", "quiz_started")
+    assert SQLiteSessionStore(path).get_stage("u1") == "quiz_started"
+
+
+def test_sqlite_purges_every_n_writes(tmp_path, clock):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), maxsize=2, ttl=60, purge_every=4)
+    for i in range(4):
+        store.set_stage(f"u{i}", "a")
+        clock[0] += 1
+    assert store.stats()["size"] == 2
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+from shopify_client import ShopifyClient, ShopifyError  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+def customer_body(name="#1001", available=1000.0, cost=10):
+    return {
+        "data": {"customers": {"nodes": [{
+            "firstName": "Asha",
+            "orders": {"nodes": [{"name": name, "displayFulfillmentStatus": "FULFILLED"}]},
+        }]}},
+        "extensions": {"cost": {
+            "requestedQueryCost": cost,
+            "throttleStatus": {"maximumAvailable": 1000.0, "currentlyAvailable": available, "restoreRate": 50.0},
+        }},
+    }
+
+
+def throttled_body():
+    return {
+        "errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}],
+        "extensions": {"cost": {
+            "requestedQueryCost": 10,
+            "throttleStatus": {"maximumAvailable": 1000.0, "currentlyAvailable": 5.0, "restoreRate": 50.0},
+        }},
+    }
+
+
+@pytest.fixture
+def client():
+    return ShopifyClient("https://shop.example/admin/api/2024-04/graphql.json", "token")
+
+
+def test_concurrent_lookups_for_one_number_share_a_request(client, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def post(url, json, timeout):
+        calls.append(json["variables"])
+        release.wait(5)
+        return FakeResponse(customer_body())
+
+    monkeypatch.setattr(client.session, "post", post)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.latest_order_by_phone("+919876543210")))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while client.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [{"query": "phone:+919876543210"}]
+    assert len(results) == 5 and all(r is results[0] for r in results)
+    assert results[0]["orders"]["nodes"][0]["name"] == "#1001"
+
+
+def test_errors_reach_every_coalesced_caller(client, monkeypatch):
+    monkeypatch.setattr(client.session, "post", lambda url, json, timeout: FakeResponse({}, 502))
+    with pytest.raises(ShopifyError):
+        client.latest_order_by_phone("+919876543210")
+    assert client.stats()["errors"] == 1
+
+
+def test_throttled_query_is_retried(client, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("shopify_client.time.sleep", sleeps.append)
+    responses = [FakeResponse(throttled_body()), FakeResponse(customer_body())]
+    monkeypatch.setattr(client.session, "post", lambda url, json, timeout: responses.pop(0))
+
+    assert client.latest_order_by_phone("+919876543210")["firstName"] == "Asha"
+    stats = client.stats()
+    assert (stats["requests"], stats["throttled"]) == (2, 1)
+    # 5 points left, 10 needed at 50/s: the retry waited for the refill
+    assert sleeps and sleeps[0] == pytest.approx(0.1, abs=0.01)
+
+
+def test_throttled_past_retries_raises(client, monkeypatch):
+    monkeypatch.setattr("shopify_client.time.sleep", lambda s: None)
+    monkeypatch.setattr(client.session, "post", lambda url, json, timeout: FakeResponse(throttled_body()))
+    with pytest.raises(ShopifyError, match="Throttled"):
+        client.execute("{ shop { name } }")
+    assert client.stats()["requests"] == client.max_retries + 1
+
+
+def test_in_flight_calls_reserve_points(client, monkeypatch):
+    now = [100.0]
+    sleeps = []
+    monkeypatch.setattr("shopify_client.time.monotonic", lambda: now[0])
+    monkeypatch.setattr("shopify_client.time.sleep", sleeps.append)
+    client._track_cost(customer_body(available=25.0, cost=10))
+
+    # Two calls fit in 25 points; the third has to wait for 5 more (0.1 s at 50/s)
+    reservations = [client._pace() for _ in range(3)]
+    assert sleeps == [pytest.approx(0.1)]
+    assert client.stats()["points_reserved"] == 30
+
+    for cost in reservations:
+        client._release(cost)
+    assert client.stats()["points_reserved"] == 0
@@ -0,0 +1,96 @@
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError  # noqa: E402
+
+from whatsapp_sender import WhatsAppSender, is_retryable  # noqa: E402
+
+
+def refused():
+    # The shape requests raises for a refused connect or failed DNS lookup
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.ConnectionError(MaxRetryError(None, "/messages", reason))
+
+
+def dropped():
+    # Raised when the server closes the connection after the body was sent
+    return requests.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError()))
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {}
+        self.text = ""
+
+
+@pytest.mark.parametrize("error, expected", [
+    (refused(), True),
+    (dropped(), False),
+    (requests.ConnectionError("unknown"), False),
+    (requests.ConnectTimeout("connect timed out"), True),
+    (requests.ReadTimeout("read timed out"), False),
+    (requests.Timeout("timed out"), False),
+    (requests.RequestException("other"), False),
+])
+def test_retry_classification_for_errors(error, expected):
+    assert is_retryable(error=error) is expected
+
+
+@pytest.mark.parametrize("status, expected", [
+    (200, False), (400, False), (401, False), (429, True), (500, True), (503, True),
+])
+def test_retry_classification_for_statuses(status, expected):
+    assert is_retryable(FakeResponse(status)) is expected
+
+
+def make_sender(monkeypatch, outcomes, **kwargs):
+    kwargs.setdefault("backoff_base", 0)
+    sender = WhatsAppSender("token", "1000", rate=1000, max_retries=3, **kwargs)
+    calls = []
+
+    def post(url, json, timeout):
+        calls.append(url)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome if isinstance(outcome, FakeResponse) else FakeResponse(outcome)
+
+    monkeypatch.setattr(sender.session, "post", post)
+    return sender, calls
+
+
+def test_read_timeout_is_not_resent(monkeypatch):
+    sender, calls = make_sender(monkeypatch, [requests.ReadTimeout("slow")])
+    assert sender.send_text("91900", "hi") is None
+    assert len(calls) == 1
+    assert sender.stats()["failed"] == 1
+
+
+def test_connect_errors_and_5xx_are_retried(monkeypatch):
+    sender, calls = make_sender(monkeypatch, [requests.ConnectTimeout("x"), 503, 200])
+    assert sender.send_text("91900", "hi").status_code == 200
+    assert len(calls) == 3
+    assert sender.stats()["retries"] == 2
+
+
+def test_dropped_connection_is_not_resent(monkeypatch):
+    sender, calls = make_sender(monkeypatch, [dropped()])
+    assert sender.send_text("91900", "hi") is None
+    assert len(calls) == 1
+
+
+def test_retry_after_past_the_budget_gives_up(monkeypatch):
+    slow = FakeResponse(429)
+    slow.headers["Retry-After"] = "30"
+    sleeps = []
+    monkeypatch.setattr("whatsapp_sender.time.sleep", sleeps.append)
+    sender, calls = make_sender(monkeypatch, [slow, 200], retry_budget=5)
+
+    assert sender.send_text("91900", "hi").status_code == 429
+    assert len(calls) == 1
+    assert sleeps == []
+    stats = sender.stats()
+    assert (stats["failed"], stats["retries"], stats["out_of_budget"]) == (1, 0, 1)
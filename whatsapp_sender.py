@@ -0,0 +1,207 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+log = logging.getLogger(__name__)
+
+# Messages per second Meta allows per business phone number (default tier)
+DEFAULT_MPS = 80
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(response=None, error=None):
+    """Whether a send attempt may be repeated without risking a duplicate message.
+
+    Only errors raised before the request reached Meta (refused or timed-out
+    connects, failed DNS lookups) and 429/5xx answers are retried. Read
+    timeouts, resets and dropped connections may come after Meta accepted
+    the message, so they are not.
+    """
+    if error is not None:
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        # requests wraps urllib3's MaxRetryError; its reason says what failed
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+    return response is not None and response.status_code in RETRY_STATUSES
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class WhatsAppSender:
+    """Sends WhatsApp Cloud API messages over a pooled, rate-limited session.
+
+    Each sending phone number id gets its own token bucket. 429 and 5xx
+    responses and failed connects are retried with jittered exponential
+    backoff, honouring ``Retry-After`` when Meta sends one. No retry is
+    started once it would end past ``retry_budget`` seconds from the first
+    attempt; the send counts as failed instead.
+
+    The buckets live in this process only; with several gunicorn workers
+    pass each one its share of the number's limit as ``rate``.
+    """
+
+    def __init__(self, access_token, phone_number_id, api_base="https://graph.facebook.com/v19.0",
+                 rate=DEFAULT_MPS, burst=None, pool_size=20, timeout=(3.05, 10),
+                 max_retries=3, backoff_base=0.5, backoff_cap=8.0, retry_budget=10.0):
+        self.phone_number_id = phone_number_id
+        self.api_base = api_base.rstrip("/")
+        self.rate = rate
+        self.burst = burst
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_budget = retry_budget
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        })
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.out_of_budget = 0
+        self.throttle_wait = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _bucket(self, phone_number_id):
+        bucket = self._buckets.get(phone_number_id)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(phone_number_id, TokenBucket(self.rate, self.burst))
+        return bucket
+
+    def _backoff(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_cap * 4)
+                except ValueError:
+                    pass
+        # Full jitter keeps retries from many workers from lining up
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def send_text(self, to, body, phone_number_id=None):
+        """Send a text message. Returns the final response, or None if every attempt errored."""
+        phone_number_id = phone_number_id or self.phone_number_id
+        url = f"{self.api_base}/{phone_number_id}/messages"
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to,
+            "text": {"body": body}
+        }
+        bucket = self._bucket(phone_number_id)
+
+        response = None
+        deadline = time.monotonic() + self.retry_budget
+        for attempt in range(self.max_retries + 1):
+            waited = bucket.acquire()
+            start = time.monotonic()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                error = None
+            except requests.RequestException as e:
+                response, error = None, e
+            elapsed = time.monotonic() - start
+
+            retry = attempt < self.max_retries and is_retryable(response, error)
+            delay = self._backoff(attempt, response) if retry else 0.0
+            out_of_budget = retry and time.monotonic() + delay > deadline
+            with self._lock:
+                self.throttle_wait += waited
+                self.latency_total += elapsed
+                self.latency_max = max(self.latency_max, elapsed)
+                if response is not None and response.status_code == 429:
+                    self.rate_limited += 1
+                if out_of_budget:
+                    self.out_of_budget += 1
+                elif retry:
+                    self.retries += 1
+
+            if not retry or out_of_budget:
+                break
+            time.sleep(delay)
+
+        ok = response is not None and response.ok
+        with self._lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+        if ok:
+            log.info("whatsapp sent", extra={"status": response.status_code, "attempts": attempt + 1})
+        elif response is not None:
+            log.warning("whatsapp send failed", extra={"status": response.status_code, "body": response.text[:200]})
+        else:
+            log.error("whatsapp send error", extra={"error": str(error)})
+        return response
+
+    def send_bulk(self, messages, phone_number_id=None, max_workers=None):
+        """Send many ``(to, body)`` pairs concurrently, still within the rate limit.
+
+        Returns the responses in input order.
+        """
+        workers = max_workers or self.pool_size
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wa-bulk") as pool:
+            futures = [pool.submit(self.send_text, to, body, phone_number_id) for to, body in messages]
+            return [f.result() for f in futures]
+
+    def stats(self):
+        with self._lock:
+            attempts = self.sent + self.failed + self.retries
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "out_of_budget": self.out_of_budget,
+                "rate_per_number": self.rate,
+                "throttle_wait_s": round(self.throttle_wait, 3),
+                "avg_latency_ms": round(self.latency_total / attempts * 1000, 2) if attempts else 0.0,
+                "max_latency_ms": round(self.latency_max * 1000, 2),
+                "tokens_available": {
+                    number: round(bucket.tokens, 2) for number, bucket in self._buckets.items()
+                },
+            }